@@ -11,6 +11,7 @@ from .dataseries import DataSeries
 from .io import read_mtz, read_precognition
 from .dtypes import summarize_mtz_dtypes
 from .concat import concat
+from .merge import merge_many, ReflectionAligner
 
 # Add support for MTZ data types:
 # see http://www.ccp4.ac.uk/html/f2mtz.html
@@ -1,6 +1,6 @@
 import numpy as np
 from scipy.special import ndtr
-from reciprocalspaceship.utils import compute_structurefactor_multiplicity
+from reciprocalspaceship.dataseries import DataSeries
 
 def _acentric_posterior(Iobs, SigIobs, Sigma):
     """
@@ -221,12 +221,21 @@ def scale_merged_intensities(ds, intensity_key, sigma_key, output_columns=None,
     .. [1] French S. and Wilson K. \"On the Treatment of Negative Intensity
        Observations,\" Acta Cryst. A34 (1978).
     """
+    # Derived properties are looked up before the DataSet is copied, so
+    # that they can be shared with the cache of the input DataSet
+    dHKL = ds._get_derived("dHKL")
+    centric = ds._get_derived("centric")
+    multiplicity = ds._get_derived("epsilon")
+
     if not inplace:
         ds = ds.copy()
 
     # Sanitize input or check for invalid reflections
     if dropna:
-        ds.dropna(subset=[intensity_key, sigma_key], inplace=True)
+        valid = ds[[intensity_key, sigma_key]].notna().to_numpy().all(axis=1)
+        if not valid.all():
+            ds.dropna(subset=[intensity_key, sigma_key], inplace=True)
+            dHKL, centric, multiplicity = dHKL[valid], centric[valid], multiplicity[valid]
     else:
         if ds[[intensity_key, sigma_key]].isna().to_numpy().any():
             raise ValueError(f"Input {ds.__class__.__name__} contains NaNs "
@@ -235,9 +244,9 @@ def scale_merged_intensities(ds, intensity_key, sigma_key, output_columns=None,
         
     # Accessory columns needed for algorithm
     if 'dHKL' not in ds:
-        ds.compute_dHKL(inplace=True)
+        ds["dHKL"] = DataSeries(np.array(dHKL), dtype="R", index=ds.index)
     if 'CENTRIC' not in ds:
-        ds.label_centrics(inplace=True)
+        ds["CENTRIC"] = np.array(centric)
 
     if output_columns:
         outputI, outputSigI, outputF, outputSigF = output_columns
@@ -252,7 +261,6 @@ def scale_merged_intensities(ds, intensity_key, sigma_key, output_columns=None,
         Sigma = mean_intensity_by_resolution(I, dHKL, bins)
     elif mean_intensity_method == "anisotropic":
         Sigma = mean_intensity_by_miller_index(I, ds.get_hkls(), bw)
-    multiplicity = compute_structurefactor_multiplicity(ds.get_hkls(), ds.spacegroup)
     Sigma = Sigma * multiplicity
 
     # Initialize outputs
@@ -1,21 +1,157 @@
 import pandas as pd
 import numpy as np
 import gemmi
+from pandas.api.extensions import ExtensionArray
+from pandas.api.types import is_integer_dtype, is_extension_array_dtype
 import reciprocalspaceship as rs
 from reciprocalspaceship.dataseries import DataSeries
 from reciprocalspaceship import utils
+from reciprocalspaceship.dtypes import HKLIndexDtype
+from reciprocalspaceship.dtypes.base import (
+    MTZInt32Dtype,
+    MTZIntegerArray,
+    NumpyExtensionArray
+)
+from reciprocalspaceship.dtypes.hklindex import HKLIndexArray
+from reciprocalspaceship.utils.hklkey import _lookup_keys
 from reciprocalspaceship.utils import (
     apply_to_hkl,
     phase_shift,
     is_centric,
     is_absent,
-    in_asu,
     hkl_to_asu,
     hkl_to_observed,
+    hkl_to_key,
+    key_to_hkl,
     compute_dHKL,
     compute_structurefactor_multiplicity,
 )
 
+def _asu_keys(dataset, H):
+    """Map Miller indices to packed ASU keys, with ISYM and phase shifts"""
+    asu_hkls, isym, phi_coeff, phi_shift = hkl_to_asu(
+        H, dataset.spacegroup, return_phase_shifts=True
+    )
+    return hkl_to_key(asu_hkls), isym, phi_coeff, phi_shift
+
+# Derived per-reflection properties that can be cached by
+# DataSet._get_derived(). Each function takes the DataSet and its
+# Miller indices.
+_derived_properties = {
+    "dHKL": lambda ds, H: compute_dHKL(H, ds.cell),
+    "centric": lambda ds, H: is_centric(H, ds.spacegroup),
+    "absent": lambda ds, H: is_absent(H, ds.spacegroup),
+    "epsilon": lambda ds, H: compute_structurefactor_multiplicity(H, ds.spacegroup, True),
+    "epsilon_primitive": lambda ds, H: compute_structurefactor_multiplicity(H, ds.spacegroup, False),
+    "asu": _asu_keys,
+}
+
+def _take(values, indexer):
+    """Take values at indexer, filling -1 entries with NA"""
+    if isinstance(values, ExtensionArray):
+        return values.take(indexer, allow_fill=True)
+    return pd.api.extensions.take(values, indexer, allow_fill=True, fill_value=np.nan)
+
+def _to_friedel_array(values, label, indexer):
+    """
+    Take values at indexer and convert them to the Friedel dtype given by
+    DataSeries.to_friedel_dtype(), without a second copy
+    """
+    values = _take(values, indexer)
+    dtype = DataSeries([], dtype=values.dtype, name=label).to_friedel_dtype().dtype
+    if dtype == values.dtype:
+        return values
+    return dtype.construct_array_type()(values.data)
+
+def _from_friedel_array(series):
+    """
+    Convert a DataSeries from its Friedel dtype, as with
+    DataSeries.from_friedel_dtype(), without copying the data
+    """
+    dtype = DataSeries([], dtype=series.dtype, name=series.name).from_friedel_dtype().dtype
+    if dtype == series.dtype:
+        return series
+    return DataSeries(dtype.construct_array_type()(series.array.data),
+                      index=series.index, name=series.name)
+
+def _shift_phases(phases, phi_coeff, phi_shift):
+    """
+    Apply phase shifts, such as those from hkl_to_asu(), to float32 phases
+    in degrees and canonicalize them. Each step is rounded to float32, as
+    in the arithmetic of PhaseArray, so the result matches shifting a
+    Phase DataSeries.
+    """
+    phases = (phases.astype(np.float64) + phi_shift).astype(np.float32)
+    phases = (phi_coeff*phases.astype(np.float64)).astype(np.float32)
+    phases = (phases + np.float32(180.)).astype(np.float32)
+    phases = (phases % np.float32(360.)).astype(np.float32)
+    return (phases - np.float32(180.)).astype(np.float32)
+
+def _to_float64(series):
+    """
+    Convert a Series to a float64 ndarray with NaN for missing values.
+    """
+    if is_extension_array_dtype(series.dtype):
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+    return series.to_numpy(dtype=np.float64)
+
+def _transform_hkl_index(dataset, op):
+    """
+    Apply a symmetry operator that permutes and negates Miller indices to
+    an H,K,L MultiIndex, using only its levels and codes. Returns None if
+    the operator or index is not supported.
+    """
+    index = dataset.index
+    names = list(index.names)
+    if (len(dataset) == 0 or sorted(names, key=str) != ["H", "K", "L"] or
+        not dataset._is_hkl_index()):
+        return None
+
+    # Each column of the rotation matrix must have a single entry of
+    # +/-DEN, so that fractional operators fall back to apply_to_hkl()
+    rot = np.array(op.rot)
+    source = np.argmax(np.abs(rot), axis=0)
+    entries = rot[source, [0, 1, 2]]
+    if (not (np.count_nonzero(rot, axis=0) == 1).all() or
+        not (np.abs(entries) == op.DEN).all() or
+        sorted(source) != [0, 1, 2]):
+        return None
+    sign = np.sign(entries)
+
+    # Output Miller index j is sign[j] times input Miller index source[j]
+    levels = []
+    codes = []
+    for name in names:
+        j = ["H", "K", "L"].index(name)
+        i = names.index(["H", "K", "L"][source[j]])
+        level = index.levels[i].to_numpy()
+        code = index.codes[i]
+        if sign[j] < 0:
+            level = -level[::-1]
+            code = (len(level) - 1 - code).astype(code.dtype)
+        levels.append(level)
+        codes.append(code)
+    return pd.MultiIndex(levels=levels, codes=codes, names=names, verify_integrity=False)
+
+def _hkl_multiindex(arrays, names):
+    """
+    Build a MultiIndex from non-empty int32 arrays of Miller indices. The
+    levels and codes of each array are computed with a lookup table over
+    its range of values, rather than by hashing.
+    """
+    levels = []
+    codes = []
+    for values in arrays:
+        vmin = values.min()
+        offset = values - vmin
+        present = np.zeros(offset.max() + 1, dtype=bool)
+        present[offset] = True
+        lookup = np.cumsum(present, dtype=np.int32) - 1
+        levels.append(np.flatnonzero(present) + vmin)
+        codes.append(lookup[offset])
+    return pd.MultiIndex(levels=levels, codes=codes, names=names,
+                         verify_integrity=False)
+
 class DataSet(pd.DataFrame):
     """
     Representation of a crystallographic dataset.
@@ -25,10 +161,19 @@ class DataSet(pd.DataFrame):
     can also be indexed by additional metadata. Per-reflection data can be 
     stored as columns. For additional information about inherited methods 
     and attributes, please see the `Pandas.DataFrame documentation`_.
+
+    Methods called with ``inplace=False``, such as ``compute_dHKL()``,
+    copy the MTZ columns of a DataSet that can still be modified, such
+    as one returned by ``read_mtz()``. The columns of the result are
+    read-only and are shared with the results of further ``inplace=False``
+    methods, so chained calls copy each column once. Read-only columns
+    are copied the first time they are modified.
     
     .. _Pandas.DataFrame documentation: https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.html
     """
     _metadata = ['_spacegroup', '_cell', '_cache_index_dtypes', '_merged']
+    _internal_names = pd.DataFrame._internal_names + ['_cache_derived']
+    _internal_names_set = set(_internal_names)
 
     #-------------------------------------------------------------------
     # __init__ method
@@ -36,6 +181,7 @@ class DataSet(pd.DataFrame):
     def __init__(self, data=None, index=None, columns=None, dtype=None,
                  copy=False, spacegroup=None, cell=None, merged=None):
         self._cache_index_dtypes = {}
+        self._cache_derived = {}
         self._spacegroup = None
         self._cell = None
         self._merged = None
@@ -139,19 +285,39 @@ class DataSet(pd.DataFrame):
         """
         if not isinstance(keys, list):
             keys = [keys]
+
+        if drop and not append and not verify_integrity and self._is_hkl_columns(keys):
+            return self._set_hkl_index(keys, inplace)
         
-        # Copy dtypes of keys to cache
+        # Copy dtypes of keys to cache. The cache is copied, because it is
+        # shared with DataSets derived from this one
+        cache = self._cache_index_dtypes.copy()
         for key in keys:
             if isinstance(key, str):
-                self._cache_index_dtypes[key] = self[key].dtype.name
+                cache[key] = self[key].dtype.name
             elif isinstance(key, (np.ndarray, pd.Index, pd.Series)):
-                self._cache_index_dtypes = key.dtype.name
+                cache = key.dtype.name
             elif isinstance(key, list):
-                self._cache_index_dtypes = type(key[0])
+                cache = type(key[0])
             else:
                 raise ValueError(f"{key} is not an instance of type str, np.ndarray, pd.Index, pd.Series, or list")
-            
-        return super().set_index(keys, drop, append, inplace, verify_integrity)
+
+        # pandas builds object levels from integer extension arrays. These
+        # are stored as int64, to match _set_hkl_index()
+        int_keys = [ k for k in keys if isinstance(k, str) and
+                     isinstance(self[k].dtype, MTZInt32Dtype) ]
+
+        result = super().set_index(keys, drop, append, inplace, verify_integrity)
+        dataset = self if inplace else result
+        dataset._cache_index_dtypes = cache
+        if int_keys and isinstance(dataset.index, pd.MultiIndex):
+            levels = [ l.astype(np.int64) if l.name in int_keys and l.dtype == object else l
+                       for l in dataset.index.levels ]
+            dataset.index = dataset.index.set_levels(levels, verify_integrity=False)
+
+        if inplace:
+            return
+        return dataset
 
     def reset_index(self, level=None, drop=False, inplace=False, col_level=0, col_fill=''):
         """
@@ -186,6 +352,10 @@ class DataSet(pd.DataFrame):
         DataSet.set_index : Set index
         """
         
+        if (level is None and not drop and col_level == 0 and col_fill == '' and
+            self._is_hkl_index()):
+            return self._reset_hkl_index(inplace)
+
         # GH#6: Handle level argument to reset_index
         columns = level
         if level is None:
@@ -204,6 +374,7 @@ class DataSet(pd.DataFrame):
         
         if inplace:
             super().reset_index(level, drop, inplace, col_level, col_fill)
+            self._cache_index_dtypes = self._cache_index_dtypes.copy()
             _handle_cached_dtypes(self, columns, drop)
             return
         else:
@@ -212,6 +383,78 @@ class DataSet(pd.DataFrame):
             dataset = _handle_cached_dtypes(dataset, columns, drop)
             return dataset
 
+    def _is_hkl_columns(self, keys):
+        """
+        Whether keys label two or more HKL columns without missing values,
+        which can be set as the index by ``_set_hkl_index()``
+        """
+        if len(keys) < 2 or len(self) == 0 or not self.columns.is_unique:
+            return False
+        for key in keys:
+            if not isinstance(key, str) or key not in self.columns:
+                return False
+            array = self[key].array
+            if not isinstance(array.dtype, HKLIndexDtype) or array._mask.any():
+                return False
+        return True
+
+    def _set_hkl_index(self, keys, inplace):
+        """
+        Set a MultiIndex from HKL columns. The levels and codes of each
+        column are computed directly from its int32 data using a lookup
+        table over the range of values, rather than by factorizing the
+        extension array in pandas.
+        """
+        index = _hkl_multiindex([self[key].array._data for key in keys], keys)
+
+        dataset = self if inplace else self._copy_on_write()
+        for key in keys:
+            del dataset[key]
+        dataset.index = index
+        dataset._cache_index_dtypes = { key: HKLIndexDtype.name for key in keys }
+
+        if inplace:
+            return
+        return dataset
+
+    def _is_hkl_index(self):
+        """
+        Whether the index is a MultiIndex of HKL columns without missing
+        values, which can be reset by ``_reset_hkl_index()``
+        """
+        index = self.index
+        if not isinstance(index, pd.MultiIndex) or isinstance(self.columns, pd.MultiIndex):
+            return False
+        names = list(index.names)
+        if (sorted(names, key=str) != sorted(self._cache_index_dtypes, key=str) or
+            any(self._cache_index_dtypes[k] != HKLIndexDtype.name for k in names) or
+            any(k in self.columns for k in names)):
+            return False
+        return all(is_integer_dtype(level.dtype) for level in index.levels) and \
+            not any((c == -1).any() for c in index.codes)
+
+    def _reset_hkl_index(self, inplace):
+        """
+        Reset a MultiIndex of HKL columns. Columns are built from the
+        int32 levels and codes of the index, so no dtype conversion is
+        needed to restore the HKL dtype.
+        """
+        names = list(self.index.names)
+        arrays = []
+        for level, codes in zip(self.index.levels, self.index.codes):
+            values = level.to_numpy(dtype=np.int32).take(codes)
+            arrays.append(HKLIndexArray(values, np.zeros(len(values), dtype=bool)))
+
+        dataset = self if inplace else self._copy_on_write()
+        dataset.index = pd.RangeIndex(len(dataset))
+        for i, (key, array) in enumerate(zip(names, arrays)):
+            dataset.insert(i, key, array)
+        dataset._cache_index_dtypes = {}
+
+        if inplace:
+            return
+        return dataset
+
     @classmethod
     def from_gemmi(cls, gemmiMtz):
         """
@@ -402,7 +645,7 @@ class DataSet(pd.DataFrame):
         keys : list of strings
             list of column labels with ``Phase`` dtype
         """
-        keys = [ k for k in self if isinstance(self.dtypes[k], rs.PhaseDtype) ]
+        keys = [ k for k, dtype in self.dtypes.items() if isinstance(dtype, rs.PhaseDtype) ]
         return keys
 
     def get_m_isym_keys(self):
@@ -436,25 +679,178 @@ class DataSet(pd.DataFrame):
         if inplace:
             F = self
         else:
-            F = self.copy()
-            
-        # Apply symop to generate new HKL indices and phase shifts
-        H = F.get_hkls()
-        hkl = apply_to_hkl(H, symop)
-        phase_shifts = np.rad2deg(phase_shift(H, symop))
-            
-        F.reset_index(inplace=True)
-        F[['H', 'K', 'L']] = hkl
-        F[['H', 'K', 'L']] = F[['H', 'K', 'L']].astype(rs.HKLIndexDtype())
-        F.set_index(['H', 'K', 'L'], inplace=True)
-
-        # Shift phases according to symop
-        for key in F.get_phase_keys():
-            F[key] += phase_shifts
-            F[key] = utils.canonicalize_phases(F[key], deg=True)
+            F = self._copy_on_write()
+
+        phase_keys = F.get_phase_keys()
+        has_shift = any(symop.tran) and phase_keys
+        H = F.get_hkls() if has_shift else None
+
+        # Apply symop to generate new HKL indices. Operators that permute
+        # and negate Miller indices are applied to the index levels
+        index = _transform_hkl_index(F, symop)
+        if index is not None:
+            F.index = index
+        else:
+            hkl = apply_to_hkl(F.get_hkls() if H is None else H, symop)
+            F._set_hkls(hkl)
+
+        # Shift phases according to symop in one pass over all phase columns
+        if phase_keys:
+            phase_shifts = np.rad2deg(phase_shift(H, symop)) if has_shift else 0.
+            phases = np.stack([ F[key].array.data for key in phase_keys ])
+            phases = _shift_phases(phases, 1., phase_shifts)
+            for key, values in zip(phase_keys, phases):
+                F[key] = rs.PhaseDtype.construct_array_type()(values)
             
         return F.__finalize__(self)
 
+    def apply_symops(self, ops, reference, column, reference_column=None,
+                     correlate=False, asu=False):
+        """
+        Apply many symmetry operations to the reflections in DataSet object
+        and align the values of a column with the reflections of a
+        reference DataSet.
+
+        This gives the same values as calling ``DataSet.apply_symop()`` for
+        each operation (followed by ``DataSet.hkl_to_asu()`` if `asu` is
+        True) and joining the result with `reference`, without
+        constructing a DataSet for each operation. It can be used to
+        resolve an indexing ambiguity by correlating the DataSet with a
+        reference under each candidate reindexing operation. For merged
+        DataSets with Miller indices in the reciprocal space ASU, use
+        ``asu=True`` so that the transformed Miller indices are mapped
+        back to the ASU of the reference.
+
+        Parameters
+        ----------
+        ops : list of str or gemmi.Op, or gemmi.GroupOps
+            Gemmi symmetry operations or strings representing symmetry ops
+        reference : rs.DataSet
+            DataSet with the Miller indices to align against. Must not
+            contain repeated Miller indices
+        column : str
+            Label of column in DataSet to align. Phases are shifted
+            according to each symmetry operation
+        reference_column : str
+            Label of column in `reference` to correlate with. If None,
+            `column` is used. Only used if `correlate=True`
+        correlate : bool
+            If True, return the Pearson correlation coefficient between
+            the aligned values and `reference_column` for each operation
+        asu : bool
+            If True, map Miller indices to the reciprocal space ASU of the
+            space group of the DataSet after applying each operation.
+            Phases are shifted accordingly
+
+        Returns
+        -------
+        np.ndarray
+            If `correlate=False`, a num_ops x len(reference) array of the
+            values of `column` after each operation, with NaN for
+            reflections of `reference` that are not in the DataSet. If
+            `correlate=True`, an array of length num_ops with the
+            correlation coefficient for each operation, computed over
+            reflections observed in both DataSets
+
+        Raises
+        ------
+        ValueError
+            If the DataSet or `reference` contains repeated Miller indices,
+            or if `asu` is True and the DataSet contains
+            symmetry-equivalent Miller indices
+
+        Examples
+        --------
+        Correlate merged intensities with a reference under each candidate
+        reindexing operation:
+
+        >>> ops = ["x,y,z", "y,x,-z"]
+        >>> cc = ds.apply_symops(ops, reference, "IMEAN", correlate=True, asu=True)
+
+        See Also
+        --------
+        DataSet.apply_symop : Apply a symmetry operation to a DataSet
+        DataSet.hkl_to_asu : Map Miller indices to the reciprocal space ASU
+        """
+        ops = [ gemmi.Op(op) if isinstance(op, str) else op for op in ops ]
+        if not all(isinstance(op, gemmi.Op) for op in ops):
+            raise ValueError(f"Provided ops are not of type gemmi.Op")
+
+        H = self.get_hkls()
+        if len(np.unique(hkl_to_key(H))) != len(H):
+            raise ValueError("DataSet must not contain repeated Miller indices")
+
+        # Position in reference of each reflection under each operation
+        ref_keys = hkl_to_key(reference.get_hkls())
+        hkls = utils.apply_to_hkl_batch(H, ops).reshape(-1, 3)
+        if asu:
+            hkls, _, phi_coeff, phi_shift = utils.hkl_to_asu(hkls, self.spacegroup,
+                                                             return_phase_shifts=True)
+        keys = hkl_to_key(hkls).reshape(len(ops), len(H))
+        if asu and (np.diff(np.sort(keys, axis=1), axis=1) == 0).any():
+            raise ValueError("DataSet must not contain symmetry-equivalent Miller "
+                             "indices if asu=True")
+        pos = _lookup_keys(keys.ravel(), ref_keys).reshape(len(ops), len(H))
+
+        values = _to_float64(self[column])
+        if isinstance(self.dtypes[column], rs.PhaseDtype):
+            tran = np.array([ op.tran for op in ops ], dtype=np.float64).reshape(-1, 3)
+            shifts = np.rad2deg(-2*np.pi*np.matmul(tran, H.T) / gemmi.Op.DEN)
+            values = _shift_phases(self[column].array.data[None, :], 1., shifts)
+            if asu:
+                values = _shift_phases(values, phi_coeff.reshape(pos.shape),
+                                       phi_shift.reshape(pos.shape))
+        else:
+            values = np.broadcast_to(values, pos.shape)
+
+        aligned = np.full((len(ops), len(ref_keys)), np.nan)
+        op_index, row = np.nonzero(pos >= 0)
+        aligned[op_index, pos[op_index, row]] = values[op_index, row]
+        if not correlate:
+            return aligned
+
+        if reference_column is None:
+            reference_column = column
+        y = _to_float64(reference[reference_column])
+        valid = ~np.isnan(aligned) & ~np.isnan(y)
+        n = valid.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dx = np.where(valid, aligned, 0.)
+            dy = np.where(valid, y, 0.)
+            dx = np.where(valid, dx - (dx.sum(axis=1) / n)[:, None], 0.)
+            dy = np.where(valid, dy - (dy.sum(axis=1) / n)[:, None], 0.)
+            cc = (dx*dy).sum(axis=1) / np.sqrt((dx**2).sum(axis=1)*(dy**2).sum(axis=1))
+        cc[n < 2] = np.nan
+        return cc
+
+    def _copy_on_write(self):
+        """
+        Copy the DataSet for methods called with ``inplace=False``.
+
+        The copy shares its index with this DataSet, which is not
+        modified. Columns with MTZ dtypes are read-only in the copy, and
+        are copied the first time the copy modifies them. Their data is
+        shared with this DataSet if it is already read-only, such as in
+        the result of an earlier ``inplace=False`` method. Otherwise,
+        such as for a DataSet fresh from ``read_mtz()``, it is copied,
+        because this DataSet and other references to its buffers can
+        still modify it. Other columns are copied. Cached derived properties are
+        shared, since the index is shared.
+
+        Returns
+        -------
+        DataSet
+        """
+        def copy_on_write(values):
+            if isinstance(values, (NumpyExtensionArray, MTZIntegerArray)):
+                return values._copy_on_write()
+            return values.copy()
+
+        mgr = self._mgr.apply(copy_on_write)
+        dataset = self._constructor(mgr).__finalize__(self)
+        dataset._cache_derived = self._get_derived_cache().copy()
+        return dataset
+
     def get_hkls(self):
         """
         Get the Miller indices in the DataSet as a ndarray.
@@ -464,9 +860,243 @@ class DataSet(pd.DataFrame):
         hkl : ndarray, shape=(n_reflections, 3)
             Miller indices in DataSet 
         """
-        hkl = self.reset_index()[['H', 'K', 'L']].to_numpy(dtype=np.int32)
+        # Read Miller indices from index levels or columns without copying
+        # the DataSet. The result is not cached, because the index and
+        # columns can be modified in place.
+        names = list(self.index.names)
+        if self._has_hkl_keys():
+            if "HKLKey" in names:
+                return key_to_hkl(self.index.get_level_values("HKLKey").to_numpy())
+            return key_to_hkl(self["HKLKey"].to_numpy())
+
+        hkl = np.empty((len(self), 3), dtype=np.int32)
+        for i, key in enumerate(["H", "K", "L"]):
+            if key in names and isinstance(self.index, pd.MultiIndex):
+                level = names.index(key)
+                values = self.index.levels[level].to_numpy(dtype=np.int32)
+                hkl[:, i] = values.take(self.index.codes[level])
+            elif key in names:
+                hkl[:, i] = self.index.to_numpy(dtype=np.int32)
+            else:
+                hkl[:, i] = self[key].to_numpy(dtype=np.int32)
         return hkl
 
+    def _has_hkl_keys(self):
+        """Whether Miller indices are stored as packed ``HKLKey`` keys"""
+        labels = list(self.index.names) + list(self.columns)
+        return "HKLKey" in labels and not any(k in labels for k in ["H", "K", "L"])
+
+    def _set_hkls(self, hkl):
+        """
+        Set the Miller indices of the DataSet in place from an n x 3 array.
+        The new values are written to the index levels or columns that hold
+        the Miller indices, including packed ``HKLKey`` keys.
+        """
+        names = list(self.index.names)
+        if (len(self) > 0 and sorted(names, key=str) == ["H", "K", "L"] and
+            all(self._cache_index_dtypes.get(k) == HKLIndexDtype.name for k in names)):
+            hkl = np.asarray(hkl, dtype=np.int32)
+            arrays = [hkl[:, ["H", "K", "L"].index(k)] for k in names]
+            self.index = _hkl_multiindex(arrays, names)
+            return
+
+        if self._has_hkl_keys():
+            values = { "HKLKey": (hkl_to_key(hkl), None) }
+        else:
+            values = { k: (hkl[:, i], "HKL") for i, k in enumerate(["H", "K", "L"]) }
+
+        index_keys = None
+        if any(k in self.index.names for k in values):
+            index_keys = self.index.names
+            self.reset_index(inplace=True)
+
+        for key, (value, dtype) in values.items():
+            self[key] = DataSeries(value, dtype=dtype, index=self.index)
+
+        if index_keys is not None:
+            self.set_index(index_keys, inplace=True)
+        return
+
+    def _get_derived_cache(self):
+        """
+        Get the dict of cached derived properties. It is created here if
+        missing, because unpickled DataSets are not initialized with
+        ``__init__()``.
+        """
+        return self.__dict__.setdefault("_cache_derived", {})
+
+    def _get_derived(self, name):
+        """
+        Get a derived per-reflection property of the Miller indices, such
+        as ``"dHKL"``, ``"centric"``, ``"absent"``, ``"epsilon"``, or
+        ``"asu"``. See ``_derived_properties`` for the supported names.
+
+        If the Miller indices are stored in the index of the DataSet, the
+        result is cached until the index, cell, or space group changes.
+        Cached arrays are read-only, and should be copied before they are
+        stored in the DataSet.
+        """
+        func = _derived_properties[name]
+        names = self.index.names
+        if not (all(k in names for k in ["H", "K", "L"]) or
+                ("HKLKey" in names and self._has_hkl_keys())):
+            return func(self, self.get_hkls())
+
+        cell = None if self.cell is None else tuple(self.cell.parameters)
+        spacegroup = None if self.spacegroup is None else self.spacegroup.xhm()
+        cache = self._get_derived_cache()
+        key = cache.get("_key")
+        if key is None or key[0] is not self.index or key[1:] != (cell, spacegroup):
+            cache.clear()
+            cache["_key"] = (self.index, cell, spacegroup)
+
+        if name not in cache:
+            value = func(self, self.get_hkls())
+            for array in (value if isinstance(value, tuple) else (value,)):
+                array.flags.writeable = False
+            cache[name] = value
+        return cache[name]
+
+    def memory_report(self, deep=False):
+        """
+        Report the memory used by the DataSet, in bytes.
+
+        Memory is broken down into the levels of the index, the columns,
+        and the derived properties of Miller indices that are cached by
+        the DataSet (such as ``dHKL`` or ``centric``). Cached arrays may
+        be shared with copies of the DataSet.
+
+        Parameters
+        ----------
+        deep : bool
+            If True, include the memory used by the Python objects of
+            columns and index levels with object dtype, as in
+            ``DataSet.memory_usage(deep=True)``
+
+        Returns
+        -------
+        rs.DataSeries
+            Memory usage in bytes, indexed by category (``"index"``,
+            ``"columns"``, or ``"cache"``) and name
+
+        See Also
+        --------
+        DataSet.memory_usage : Memory usage of each column
+        """
+        keys = []
+        values = []
+        if isinstance(self.index, pd.MultiIndex):
+            for name, level, codes in zip(self.index.names, self.index.levels, self.index.codes):
+                keys.append(("index", name))
+                values.append(level.memory_usage(deep=deep) + codes.nbytes)
+        else:
+            keys.append(("index", "Index" if self.index.name is None else self.index.name))
+            values.append(self.index.memory_usage(deep=deep))
+
+        for label, nbytes in self.memory_usage(index=False, deep=deep).items():
+            keys.append(("columns", label))
+            values.append(nbytes)
+
+        for name, value in self._get_derived_cache().items():
+            if name == "_key":
+                continue
+            keys.append(("cache", name))
+            values.append(sum(a.nbytes for a in (value if isinstance(value, tuple) else (value,))))
+
+        index = pd.MultiIndex.from_tuples(keys, names=["category", "name"])
+        return DataSeries(values, index=index, dtype=np.int64, name="bytes")
+
+    def hkl_to_key(self, inplace=False):
+        """
+        Replace Miller indices with packed 64-bit integer keys, labeled
+        ``HKLKey``.
+
+        If H, K, and L are the index of the DataSet, they are replaced
+        by an ``HKLKey`` index. If they are columns, they are replaced by
+        an ``HKLKey`` column. A single integer index uses less memory than
+        the ``["H", "K", "L"]`` MultiIndex, and makes joins, merges, and
+        groupby operations on Miller indices hash a single integer.
+
+        Parameters
+        ----------
+        inplace : bool
+            Whether to modify the DataSet in place or return a copy
+
+        Returns
+        -------
+        DataSet
+
+        See Also
+        --------
+        DataSet.key_to_hkl : Opposite of DataSet.hkl_to_key()
+        rs.utils.hkl_to_key : Pack Miller indices into 64-bit integer keys
+        """
+        if inplace:
+            dataset = self
+        else:
+            dataset = self._copy_on_write()
+
+        names = list(dataset.index.names)
+        keys = hkl_to_key(dataset.get_hkls())
+        if sorted(names) == ["H", "K", "L"]:
+            dataset._cache_index_dtypes = { "HKLKey": keys.dtype.name }
+            dataset.index = pd.Index(keys, name="HKLKey")
+        elif (all(k in dataset.columns for k in ["H", "K", "L"]) and
+              not any(k in names for k in ["H", "K", "L"])):
+            loc = min(dataset.columns.get_loc(k) for k in ["H", "K", "L"])
+            dataset.drop(columns=["H", "K", "L"], inplace=True)
+            dataset.insert(loc, "HKLKey", keys)
+        else:
+            raise ValueError(f"H, K, and L must all be in the index or all be columns of the DataSet")
+
+        return dataset
+
+    def key_to_hkl(self, inplace=False):
+        """
+        Replace packed 64-bit ``HKLKey`` keys with H, K, and L Miller
+        indices.
+
+        An ``HKLKey`` index is replaced by an ``["H", "K", "L"]``
+        MultiIndex, and an ``HKLKey`` column is replaced by H, K, and L
+        columns.
+
+        Parameters
+        ----------
+        inplace : bool
+            Whether to modify the DataSet in place or return a copy
+
+        Returns
+        -------
+        DataSet
+
+        See Also
+        --------
+        DataSet.hkl_to_key : Opposite of DataSet.key_to_hkl()
+        rs.utils.key_to_hkl : Unpack 64-bit integer keys into Miller indices
+        """
+        if inplace:
+            dataset = self
+        else:
+            dataset = self._copy_on_write()
+
+        if list(dataset.index.names) == ["HKLKey"]:
+            hkl = key_to_hkl(dataset.index.to_numpy())
+            dataset._cache_index_dtypes = {}
+            dataset.reset_index(drop=True, inplace=True)
+            for i, key in enumerate(["H", "K", "L"]):
+                dataset.insert(i, key, DataSeries(hkl[:, i], dtype="HKL", index=dataset.index))
+            dataset.set_index(["H", "K", "L"], inplace=True)
+        elif "HKLKey" in dataset.columns:
+            loc = dataset.columns.get_loc("HKLKey")
+            hkl = key_to_hkl(dataset["HKLKey"].to_numpy())
+            dataset.drop(columns="HKLKey", inplace=True)
+            for i, key in enumerate(["H", "K", "L"]):
+                dataset.insert(loc + i, key, DataSeries(hkl[:, i], dtype="HKL", index=dataset.index))
+        else:
+            raise ValueError(f"DataSet does not have an HKLKey index or column")
+
+        return dataset
+
     def label_centrics(self, inplace=False):
         """
         Label centric reflections in DataSet. A new column of
@@ -480,9 +1110,9 @@ class DataSet(pd.DataFrame):
         if inplace:
             dataset = self
         else:
-            dataset = self.copy()
+            dataset = self._copy_on_write()
 
-        dataset['CENTRIC'] = is_centric(dataset.get_hkls(), dataset.spacegroup)
+        dataset['CENTRIC'] = self._get_derived("centric").copy()
         return dataset
 
     def label_absences(self, inplace=False):
@@ -498,9 +1128,9 @@ class DataSet(pd.DataFrame):
         if inplace:
             dataset = self
         else:
-            dataset = self.copy()
+            dataset = self._copy_on_write()
 
-        dataset['ABSENT'] = is_absent(dataset.get_hkls(), dataset.spacegroup)
+        dataset['ABSENT'] = self._get_derived("absent").copy()
         return dataset
 
     def infer_mtz_dtypes(self, inplace=False, index=True):
@@ -531,7 +1161,7 @@ class DataSet(pd.DataFrame):
         if inplace:
             dataset = self
         else:
-            dataset = self.copy()
+            dataset = self._copy_on_write()
 
         # See GH#2: Handle unnamed Index objects such as RangeIndex
         if index:
@@ -560,9 +1190,9 @@ class DataSet(pd.DataFrame):
         if inplace:
             dataset = self
         else:
-            dataset = self.copy()
+            dataset = self._copy_on_write()
 
-        dHKL = compute_dHKL(self.get_hkls(), self.cell)
+        dHKL = self._get_derived("dHKL").copy()
         dataset['dHKL'] = rs.DataSeries(dHKL, dtype='R', index=dataset.index)
         return dataset
 
@@ -582,9 +1212,12 @@ class DataSet(pd.DataFrame):
         if inplace:
             dataset = self
         else:
-            dataset = self.copy()
+            dataset = self._copy_on_write()
 
-        epsilon = compute_structurefactor_multiplicity(self.get_hkls(), self.spacegroup, include_centering)
+        if include_centering:
+            epsilon = self._get_derived("epsilon").copy()
+        else:
+            epsilon = self._get_derived("epsilon_primitive").copy()
         dataset['EPSILON'] = rs.DataSeries(epsilon, dtype='I', index=dataset.index)
         return dataset
 
@@ -609,8 +1242,8 @@ class DataSet(pd.DataFrame):
         if inplace:
             dataset = self
         else:
-            dataset = self.copy()
-        dHKL = dataset.compute_dHKL()["dHKL"]
+            dataset = self._copy_on_write()
+        dHKL = self._get_derived("dHKL")
 
         assignments, labels = rs.utils.bin_by_percentile(dHKL, bins=bins, ascending=False)
         dataset["bin"] = rs.DataSeries(assignments, dtype="I", index=dataset.index)
@@ -694,10 +1327,7 @@ class DataSet(pd.DataFrame):
 
         # Handle merged DataSet case
         if self.merged:
-            dataset_plus = self.copy()
-            dataset_plus.drop(columns=minus_labels, inplace=True)
-            dataset_minus = self.copy().drop(columns=plus_labels)
-            dataset_minus.apply_symop(gemmi.Op("-x,-y,-z"), inplace=True)
+            return self._stack_anomalous_merged(plus_labels, minus_labels, new_labels)
             
         # Handle unmerged DataSet case
         else:
@@ -716,6 +1346,108 @@ class DataSet(pd.DataFrame):
             
         return F.__finalize__(self)
 
+    def _stack_anomalous_merged(self, plus_labels, minus_labels, new_labels):
+        """
+        Stack Friedel pairs of a merged DataSet. Each output column is
+        written once, with rows for the Friedel-plus Miller indices
+        followed by rows for the Friedel-minus Miller indices. Rows of the
+        Friedel-minus half have their phases canonicalized, as they would
+        by ``apply_symop("-x,-y,-z")``.
+        """
+        n = len(self)
+        minus_of = dict(zip(plus_labels, minus_labels))
+        friedel_labels = dict(zip(plus_labels, new_labels))
+
+        data = {}
+        dtypes = self.dtypes
+        for i, label in enumerate(self.columns):
+            if label in minus_labels:
+                continue
+            plus = self.iloc[:, i].array
+            minus = self[minus_of[label]].array if label in minus_of else plus
+            if isinstance(dtypes.iloc[i], rs.PhaseDtype):
+                minus = type(minus)(utils.canonicalize_phases(minus.data, deg=True))
+            if isinstance(plus, ExtensionArray):
+                values = type(plus)._concat_same_type([plus, minus])
+            else:
+                values = np.concatenate([plus, minus])
+            data[friedel_labels.get(label, label)] = values
+
+        rows = np.arange(n)
+        index = self.index.take(np.concatenate([rows, rows]))
+        result = DataSet(data, index=index).__finalize__(self)
+        result._cache_index_dtypes = self._cache_index_dtypes.copy()
+
+        hkls = self.get_hkls()
+        result._set_hkls(np.concatenate([hkls, -hkls]))
+        for label in new_labels:
+            result[label] = _from_friedel_array(result[label])
+        return result
+
+    def _unstack_anomalous_merged(self, columns, suffixes):
+        """
+        Unstack Friedel pairs of a merged DataSet with a MultiIndex of
+        Miller indices. Rows are matched by their ASU key, and each output
+        column is taken once from the input, with missing Friedel mates
+        filled as NA. The result matches an outer merge of the
+        Friedel-plus and Friedel-minus rows on the ASU Miller indices.
+
+        Returns None if either half has more than one row for an ASU
+        Miller index, which requires the merge.
+        """
+        asu_keys, isym, phi_coeff, phi_shift = self._get_derived("asu")
+        names = list(self.index.names)
+        if names != ["H", "K", "L"]:
+            order = [["H", "K", "L"].index(k) for k in names]
+            asu_keys = hkl_to_key(key_to_hkl(asu_keys)[:, order])
+
+        # Rows are ordered as in an outer join: sorted if both halves are
+        # sorted, and otherwise in order of appearance with Friedel-plus
+        # rows first
+        plus = isym % 2 == 1
+        kplus, kminus = asu_keys[plus], asu_keys[~plus]
+        if (kplus[1:] >= kplus[:-1]).all() and (kminus[1:] >= kminus[:-1]).all():
+            keys = np.union1d(kplus, kminus)
+        else:
+            keys = np.concatenate([kplus, kminus[~np.isin(kminus, kplus)]])
+        sorter = np.argsort(keys, kind="stable")
+        rows = []
+        for k in (kplus, kminus):
+            pos = sorter[np.searchsorted(keys, k, sorter=sorter)]
+            if np.bincount(pos, minlength=len(keys)).max(initial=0) > 1:
+                return None
+            rows.append(pos)
+        iplus = np.full(len(keys), -1, dtype=np.intp)
+        iplus[rows[0]] = np.flatnonzero(plus)
+        iminus = np.full(len(keys), -1, dtype=np.intp)
+        iminus[rows[1]] = np.flatnonzero(~plus)
+
+        # Columns of the DataSet mapped to the ASU
+        dtypes = self.dtypes
+        values = {}
+        for i, label in enumerate(self.columns):
+            array = self.iloc[:, i].array
+            if isinstance(dtypes.iloc[i], rs.PhaseDtype):
+                array = type(array)(_shift_phases(array.data, phi_coeff, phi_shift))
+            values[label] = array
+        if "M/ISYM" in self.columns:
+            values["M/ISYM"] = DataSeries(isym, dtype="M/ISYM").array
+
+        data = {}
+        for label, array in values.items():
+            if label in columns:
+                data[label + suffixes[0]] = _to_friedel_array(array, label, iplus)
+            else:
+                data[label] = _take(array, iplus)
+        for label in columns:
+            data[label + suffixes[1]] = _to_friedel_array(values[label], label, iminus)
+
+        hkls = key_to_hkl(keys)
+        index = _hkl_multiindex([hkls[:, i] for i in range(3)], names)
+        result = DataSet(data, index=index).__finalize__(self)
+        result._cache_index_dtypes = self._cache_index_dtypes.copy()
+        return result
+
     def unstack_anomalous(self, columns=None, suffixes=("(+)", "(-)")):
         """
         Convert data from one-column format to two-column anomalous
@@ -768,9 +1500,16 @@ class DataSet(pd.DataFrame):
         if not (isinstance(suffixes, (list, tuple)) and len(suffixes) == 2):
             raise ValueError(f"Expected suffixes to be tuple or list of len() of 2")
 
+        if "PARTIAL" in columns: columns.remove("PARTIAL")
+
+        if (self.merged and len(self) > 0 and self._is_hkl_index() and
+            sorted(self.index.names) == ["H", "K", "L"]):
+            result = self._unstack_anomalous_merged(columns, suffixes)
+            if result is not None:
+                return result
+
         # Separate DataSet into Friedel(+) and Friedel(-)
         dataset = self.hkl_to_asu()
-        if "PARTIAL" in columns: columns.remove("PARTIAL")
         for column in columns:
             dataset[column] = dataset[column].to_friedel_dtype()
         dataset_plus  = dataset.loc[dataset["M/ISYM"]%2 == 1].copy()
@@ -865,44 +1604,28 @@ class DataSet(pd.DataFrame):
         --------
         DataSet.hkl_to_observed : Opposite of DataSet.hkl_to_asu()
         """
+        # Compute new HKLs and phase shifts
+        asu_keys, isym, phi_coeff, phi_shift = self._get_derived("asu")
+
         if inplace:
             dataset = self
         else:
-            dataset = self.copy()
-
-        index_keys = None
-        if "H" in dataset.index.names or "K" in dataset.index.names or "L" in dataset.index.names:
-            index_keys = dataset.index.names
-            dataset.reset_index(inplace=True)
-
-        # Compute new HKLs and phase shifts
-        hkls = dataset.get_hkls()
-        compressed_hkls, inverse = np.unique(hkls, axis=0, return_inverse=True)
-        asu_hkls, isym, phi_coeff, phi_shift = hkl_to_asu(
-            compressed_hkls, 
-            dataset.spacegroup, 
-            return_phase_shifts=True
-        )
-
+            dataset = self._copy_on_write()
 
-        dataset[["H", "K", "L"]] = asu_hkls[inverse]
-        dataset[["H", "K", "L"]] = dataset[["H", "K", "L"]].astype("HKL")
-
-        if index_keys is not None:
-            dataset.set_index(index_keys, inplace=True)
+        dataset._set_hkls(key_to_hkl(asu_keys))
 
         # Apply phase shift
         for k in dataset.get_phase_keys():
-            dataset[k] = phi_coeff[inverse] * (dataset[k] + phi_shift[inverse])
+            dataset[k] = phi_coeff * (dataset[k] + phi_shift)
         dataset.canonicalize_phases(inplace=True)
 
         # GH#3: if PARTIAL column exists, use it to construct M/ISYM
         if "PARTIAL" in dataset.columns:
-            m_isym = isym[inverse] + 256*dataset["PARTIAL"].to_numpy()
+            m_isym = isym + 256*dataset["PARTIAL"].to_numpy()
             dataset['M/ISYM'] = DataSeries(m_isym, dtype="M/ISYM", index=dataset.index)
             dataset.drop(columns="PARTIAL", inplace=True)
         else:
-            dataset['M/ISYM'] = DataSeries(isym[inverse], dtype="M/ISYM", index=dataset.index)
+            dataset['M/ISYM'] = DataSeries(isym, dtype="M/ISYM", index=dataset.index)
 
         return dataset
 
@@ -940,7 +1663,7 @@ class DataSet(pd.DataFrame):
         if inplace:
             dataset = self
         else:
-            dataset = self.copy()
+            dataset = self._copy_on_write()
 
         # Validate input
         if m_isym is None:
@@ -962,23 +1685,17 @@ class DataSet(pd.DataFrame):
         
         # Compute new HKLs and phase shifts
         hkls = dataset.get_hkls()
-        hkls_isym = np.concatenate([hkls, isym.reshape(-1, 1)], axis=1)
-        compressed, inverse = np.unique(hkls_isym, axis=0, return_inverse=True)
         observed_hkls, phi_coeff, phi_shift = hkl_to_observed(
-            compressed[:, :3],       # compressed HKLs
-            compressed[:, 3],        # compressed ISYM
+            hkls,
+            isym,
             dataset.spacegroup,
             return_phase_shifts=True
         )
-        index_keys = dataset.index.names
-        dataset.reset_index(inplace=True)
-        dataset[["H", "K", "L"]] = observed_hkls[inverse]
-        dataset[["H", "K", "L"]] = dataset[["H", "K", "L"]].astype("HKL")
-        dataset.set_index(index_keys, inplace=True)
+        dataset._set_hkls(observed_hkls)
 
         # Apply phase shift
         for k in dataset.get_phase_keys():
-            dataset[k] = phi_coeff[inverse] * (dataset[k] + phi_shift[inverse])
+            dataset[k] = phi_coeff * (dataset[k] + phi_shift)
         dataset.canonicalize_phases(inplace=True)
         
         return dataset
@@ -1001,7 +1718,7 @@ class DataSet(pd.DataFrame):
         if inplace:
             dataset = self
         else:
-            dataset = self.copy()
+            dataset = self._copy_on_write()
 
         for k in dataset.get_phase_keys():
             dataset[k] = utils.canonicalize_phases(dataset[k])
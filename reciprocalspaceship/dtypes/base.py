@@ -1,6 +1,7 @@
+import numbers
 import operator
 import numpy as np
-from pandas.core import nanops
+from pandas.core import nanops, ops
 from pandas.core.indexers import check_array_indexer
 from pandas.core.construction import extract_array
 from pandas._libs import lib, missing as libmissing
@@ -11,9 +12,13 @@ from pandas.api.extensions import (
     take
 )
 from pandas.core.arrays.integer import IntegerArray, coerce_to_array
+from pandas.core.arrays.masked import BaseMaskedArray
+from pandas.core.dtypes.generic import ABCDataFrame, ABCIndexClass, ABCSeries
 from pandas.core.tools.numeric import to_numeric
 from pandas.util._decorators import cache_readonly
+from pandas.compat import set_function_name
 from pandas.core.dtypes.cast import astype_nansafe
+from pandas.api.types import is_integer_dtype
 import pandas as pd
 
 class MTZDtype(ExtensionDtype):
@@ -41,11 +46,84 @@ class MTZInt32Dtype(MTZDtype, pd.Int32Dtype):
         return self.name
 
 class MTZIntegerArray(IntegerArray):
+    """
+    Base ExtensionArray for MTZDtypes backed by int32 data with a mask of
+    missing values.
+
+    Arrays without missing values do not store their mask. It is replaced
+    by a read-only view of a single False value, which is copied to a
+    writeable array before values are set.
+
+    Read-only data and masks, such as those shared by
+    ``_copy_on_write()``, are also copied before values are set.
+    """
+
+    def __init__(self, values, mask, copy=False):
+        super().__init__(values, mask, copy=copy)
+        if not _is_compact_mask(self._mask) and not self._mask.any():
+            self._mask = _compact_mask(len(self._mask))
 
     @cache_readonly
     def dtype(self):
         return self._dtype
 
+    @property
+    def _hasna(self):
+        return not _is_compact_mask(self._mask) and self._mask.any()
+
+    @property
+    def nbytes(self):
+        if _is_compact_mask(self._mask):
+            return self._data.nbytes
+        return self._data.nbytes + self._mask.nbytes
+
+    def isna(self):
+        if _is_compact_mask(self._mask):
+            return np.zeros(len(self), dtype=bool)
+        return self._mask
+
+    def __setitem__(self, key, value):
+        self._ensure_writeable()
+        super().__setitem__(key, value)
+
+    def _ensure_writeable(self):
+        """Copy read-only data and masks before they are modified"""
+        if not self._data.flags.writeable:
+            self._data = self._data.copy()
+        if not self._mask.flags.writeable:
+            self._mask = self._mask.copy()
+
+    def _copy_on_write(self):
+        """
+        Copy the array without copying read-only data.
+
+        The copy has read-only data and mask, which it copies the first
+        time it is modified. They are shared with this array if they
+        cannot be modified through any other reference, and copied
+        otherwise. This array is not modified.
+
+        Returns
+        -------
+        MTZIntegerArray
+        """
+        if _is_compact_mask(self._mask):
+            mask = _compact_mask(len(self._mask))
+        else:
+            mask = _readonly(self._mask)
+        return type(self)(_readonly(self._data), mask)
+
+    def factorize(self, na_sentinel=-1):
+        # Missing values are dropped before factorizing, because the
+        # hashtables require a writeable mask
+        if _is_compact_mask(self._mask):
+            codes, uniques = pd.factorize(self._data, na_sentinel=na_sentinel)
+        else:
+            valid = ~self._mask
+            codes = np.full(len(self), na_sentinel, dtype=np.intp)
+            codes[valid], uniques = pd.factorize(self._data[valid], na_sentinel=na_sentinel)
+        uniques = uniques.astype(self.dtype.numpy_dtype, copy=False)
+        return codes, type(self)(uniques, _compact_mask(len(uniques)))
+
     @classmethod
     def _from_sequence(cls, scalars, dtype=None, copy=False):
         values, mask = coerce_to_array(scalars, dtype=dtype, copy=copy)
@@ -59,6 +137,69 @@ class MTZIntegerArray(IntegerArray):
     def reshape(self, *args, **kwargs):
         return self._data.reshape(*args, **kwargs)
 
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        """
+        Apply NumPy ufuncs to the backing int32 ndarray.
+
+        Integer results with the dtype of the backing ndarray keep the MTZ
+        dtype of this array, and missing values are propagated from the
+        inputs. Floating-point results are returned as ndarrays with NaN
+        for missing values. Arrays passed as `out` are updated in place.
+        """
+        if method == "reduce":
+            # Not clear how to handle missing values in reductions. Raise.
+            raise NotImplementedError("The 'reduce' method is not supported.")
+        out = kwargs.get("out", ())
+
+        for x in inputs + out:
+            if not isinstance(x, self._HANDLED_TYPES + (IntegerArray,)):
+                return NotImplemented
+
+        # for binary ops, use our custom dunder methods
+        result = ops.maybe_dispatch_ufunc_to_dunder_op(
+            self, ufunc, method, *inputs, **kwargs
+        )
+        if result is not NotImplemented:
+            return result
+
+        mask = np.zeros(len(self), dtype=bool)
+        inputs2 = []
+        for x in inputs:
+            if isinstance(x, IntegerArray):
+                mask |= x._mask
+                inputs2.append(x._data)
+            else:
+                inputs2.append(x)
+        if out:
+            for x in out:
+                if isinstance(x, MTZIntegerArray):
+                    x._ensure_writeable()
+            kwargs["out"] = tuple(x._data if isinstance(x, IntegerArray) else x for x in out)
+
+        result = getattr(ufunc, method)(*inputs2, **kwargs)
+        if out:
+            for x in out:
+                if isinstance(x, IntegerArray):
+                    x._mask = mask.copy()
+                elif x.dtype.kind == "f":
+                    x[mask] = np.nan
+            return out[0] if len(out) == 1 else out
+        elif method == "at":
+            return None
+
+        def reconstruct(x):
+            if x.dtype == self._data.dtype:
+                return type(self)(x, mask.copy())
+            elif is_integer_dtype(x.dtype):
+                return IntegerArray(x, mask.copy())
+            elif x.dtype.kind == "f":
+                x[mask] = np.nan
+            return x
+
+        if isinstance(result, tuple):
+            return tuple(reconstruct(x) for x in result)
+        return reconstruct(result)
+
     def to_numpy(self, dtype=None, copy=False, na_value=lib.no_default):
         """
         Convert to a NumPy Array.
@@ -147,6 +288,33 @@ class MTZIntegerArray(IntegerArray):
         return rs.DataSeries(array, index=index)
 
     
+def _compact_mask(length):
+    """Mask without missing values that does not allocate an array"""
+    return np.broadcast_to(np.False_, (length,))
+
+def _is_compact_mask(mask):
+    return mask.strides == (0,) and not mask.flags.writeable
+
+def _is_immutable(array):
+    """Whether the data of an ndarray cannot be written through any view"""
+    while isinstance(array, np.ndarray):
+        if array.flags.writeable:
+            return False
+        array = array.base
+    return True
+
+def _readonly(array):
+    """
+    Read-only ndarray with the values of `array`, which is copied unless
+    its data is immutable. `array` is not modified.
+    """
+    if _is_immutable(array):
+        return array
+    copy = array.copy()
+    copy.flags.writeable = False
+    return copy
+
+
 class NumpyFloat32ExtensionDtype(MTZDtype):
     """Base ExtensionDtype class for generic MTZDtype backed by np.float32"""
 
@@ -173,10 +341,10 @@ class NumpyExtensionArray(ExtensionArray, ExtensionScalarOpsMixin):
     Base ExtensionArray for defining a custom Pandas.ExtensionDtype that
     uses a numpy array on the backend for storing the array data.
     """
-    _itemsize = 8
     ndim = 1
     can_hold_na = True
     __array_priority__ = 1000
+    _HANDLED_TYPES = (np.ndarray, numbers.Number)
 
     def __init__(self, values, copy=False, dtype=None):
         self.data = np.array(values, dtype=self._dtype.type, copy=copy)
@@ -198,6 +366,9 @@ class NumpyExtensionArray(ExtensionArray, ExtensionScalarOpsMixin):
     def _from_factorized(cls, values, original):
         return cls(values)
 
+    def _values_for_factorize(self):
+        return self.data, np.nan
+
     @classmethod
     def _from_ndarray(cls, data, copy=False):
         return cls(data, copy=copy)
@@ -223,7 +394,7 @@ class NumpyExtensionArray(ExtensionArray, ExtensionScalarOpsMixin):
 
     @property
     def nbytes(self):
-        return self._itemsize * len(self)
+        return self.data.nbytes
 
     def reshape(self, *args, **kwargs):
         return self.data.reshape(*args, **kwargs)
@@ -247,8 +418,29 @@ class NumpyExtensionArray(ExtensionArray, ExtensionScalarOpsMixin):
         if not scalar_value:
             value = np.asarray(value, dtype=self.data.dtype)
 
+        self._ensure_writeable()
         self.data[key] = value
 
+    def _ensure_writeable(self):
+        """Copy read-only data before it is modified"""
+        if not self.data.flags.writeable:
+            self.data = self.data.copy()
+
+    def _copy_on_write(self):
+        """
+        Copy the array without copying read-only data.
+
+        The copy has read-only data, which it copies the first time it is
+        modified. The data is shared with this array if it cannot be
+        modified through any other reference, and copied otherwise. This
+        array is not modified.
+
+        Returns
+        -------
+        NumpyExtensionArray
+        """
+        return type(self)(_readonly(self.data))
+
     def isna(self):
         return np.isnan(self.data)
 
@@ -283,9 +475,7 @@ class NumpyExtensionArray(ExtensionArray, ExtensionScalarOpsMixin):
         return self.data.argsort()
 
     def unique(self):
-        _, indices = np.unique(self.data, return_index=True)
-        data = self.data.take(np.sort(indices))
-        return self._from_ndarray(data)
+        return self._from_ndarray(pd.unique(self.data))
 
     def __iter__(self):
         return iter(self.data)
@@ -294,7 +484,7 @@ class NumpyExtensionArray(ExtensionArray, ExtensionScalarOpsMixin):
         data = self.data
 
         op = getattr(nanops, 'nan' + name)
-        result = op(data, axis=0, skipna=skipna)
+        result = op(data, axis=0, skipna=skipna, **kwargs)
 
         return result
 
@@ -352,5 +542,162 @@ class NumpyExtensionArray(ExtensionArray, ExtensionScalarOpsMixin):
     def __array__(self, dtype=None):
         return self._coerce_to_ndarray(dtype=dtype)
 
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        """
+        Apply NumPy ufuncs to the backing float32 ndarray.
+
+        Ufuncs whose results have the units of their inputs, such as
+        ``np.negative()`` or ``np.maximum()``, return float32 arrays with
+        the dtype of this array. Other results, such as the output of
+        ``np.sqrt()``, ``np.cos()`` or ``np.isnan()``, are returned as
+        ndarrays. Arrays passed as `out` are updated in place.
+        """
+        out = kwargs.get("out", ())
+
+        for x in inputs:
+            if not isinstance(x, self._HANDLED_TYPES + (NumpyExtensionArray, BaseMaskedArray)):
+                return NotImplemented
+        # Masked arrays are unboxed to copies, which cannot be written to
+        for x in out:
+            if not isinstance(x, (np.ndarray, NumpyExtensionArray)):
+                return NotImplemented
+
+        # for binary ops, use our custom dunder methods
+        result = ops.maybe_dispatch_ufunc_to_dunder_op(
+            self, ufunc, method, *inputs, **kwargs
+        )
+        if result is not NotImplemented:
+            return result
+
+        inputs = tuple(_unbox_numeric(x) for x in inputs)
+        if out:
+            for x in out:
+                if isinstance(x, NumpyExtensionArray):
+                    x._ensure_writeable()
+            kwargs["out"] = tuple(_unbox_numeric(x) for x in out)
+
+        result = getattr(ufunc, method)(*inputs, **kwargs)
+        if out:
+            return out[0] if len(out) == 1 else out
+        elif method == "at":
+            return None
+
+        keep_dtype = ufunc in _UNIT_PRESERVING_UFUNCS
+
+        def reconstruct(x):
+            if (keep_dtype and isinstance(x, np.ndarray) and x.ndim == 1
+                    and x.dtype.kind == "f"):
+                return self._from_ndarray(x.astype(self.dtype.type, copy=False))
+            return x
+
+        if isinstance(result, tuple):
+            return tuple(reconstruct(x) for x in result)
+        return reconstruct(result)
+
+    def __neg__(self):
+        return self._from_ndarray(-self.data)
+
+    def __pos__(self):
+        return self._from_ndarray(self.data.copy())
+
+    def __abs__(self):
+        return self._from_ndarray(np.abs(self.data))
+
+    @classmethod
+    def _create_arithmetic_method(cls, op):
+        """
+        Create an arithmetic method that operates on the backing ndarray.
+
+        Operands are promoted as for NumPy scalars, so float32 values are
+        combined with Python and float64 numbers in float64. The result
+        is cast back to float32 and has the dtype of this array. Complex
+        results are returned as complex ndarrays. Operands that are not
+        numeric fall back to the element-wise operators of
+        ExtensionScalarOpsMixin.
+        """
+        elementwise = cls._create_method(op)
+
+        def arithmetic_method(self, other):
+            if isinstance(other, (ABCDataFrame, ABCSeries, ABCIndexClass)):
+                # rely on pandas to unbox and dispatch to us
+                return NotImplemented
+
+            operands = _numeric_operands(self, other)
+            if operands is None:
+                return elementwise(self, other)
+
+            with np.errstate(all="ignore"):
+                result = op(*operands)
+            if operands[0].dtype.kind == "c":
+                return result
+            if op.__name__ in {"divmod", "rdivmod"}:
+                return tuple(self._from_ndarray(r.astype(self.dtype.type, copy=False))
+                             for r in result)
+            return self._from_ndarray(result.astype(self.dtype.type, copy=False))
+
+        return set_function_name(arithmetic_method, f"__{op.__name__}__", cls)
+
+    @classmethod
+    def _create_comparison_method(cls, op):
+        """
+        Create a comparison method that operates on the backing ndarray and
+        returns a boolean ndarray. Operands are promoted as for arithmetic
+        methods.
+        """
+        elementwise = cls._create_method(op, coerce_to_dtype=False, result_dtype=bool)
+
+        def comparison_method(self, other):
+            if isinstance(other, (ABCDataFrame, ABCSeries, ABCIndexClass)):
+                # rely on pandas to unbox and dispatch to us
+                return NotImplemented
+
+            operands = _numeric_operands(self, other)
+            if operands is None or operands[0].dtype.kind == "c":
+                return elementwise(self, other)
+
+            with np.errstate(all="ignore"):
+                return op(*operands)
+
+        return set_function_name(comparison_method, f"__{op.__name__}__", cls)
+
+# NumPy ufuncs whose results have the units of their inputs
+_UNIT_PRESERVING_UFUNCS = frozenset({
+    np.negative, np.positive, np.absolute, np.fabs, np.maximum, np.minimum,
+    np.fmax, np.fmin, np.rint, np.floor, np.ceil, np.trunc,
+})
+
+def _unbox_numeric(x):
+    """Get the ndarray backing an MTZ array, with NaN for missing values"""
+    if isinstance(x, NumpyExtensionArray):
+        return x.data
+    elif isinstance(x, BaseMaskedArray):
+        return x.to_numpy(dtype=np.float64, na_value=np.nan)
+    return x
+
+def _numeric_operands(array, other):
+    """
+    Convert the operands of a binary operation on a NumpyExtensionArray to
+    ndarrays of a common dtype. The dtype is promoted from the dtypes of
+    both operands, without the value-based casting NumPy applies to
+    scalars, to match element-wise operations on NumPy scalars. Returns
+    None if `other` is not numeric.
+    """
+    if isinstance(other, (NumpyExtensionArray, BaseMaskedArray)):
+        other = _unbox_numeric(other)
+    elif lib.is_scalar(other) and not isinstance(other, (bool, int, float, complex, np.number, np.bool_)):
+        return None
+    elif isinstance(other, ExtensionArray):
+        return None
+    else:
+        other = np.asarray(other)
+
+    if other.dtype.kind not in "biufc":
+        return None
+    if other.ndim > 0 and other.shape != array.data.shape:
+        raise ValueError(f"Lengths must match to perform operation: "
+                         f"{len(array)} != {len(other)}")
+    dtype = np.promote_types(array.data.dtype, other.dtype)
+    return array.data.astype(dtype, copy=False), other.astype(dtype, copy=False)
+
 NumpyExtensionArray._add_arithmetic_ops()
 NumpyExtensionArray._add_comparison_ops()
@@ -3,6 +3,8 @@ from .mtz import (
     to_gemmi,
     read_mtz,
     write_mtz,
+    read_mtz_chunks,
+    MTZWriter,
 )
 from .precognition import (
     read_precognition,
@@ -1,10 +1,16 @@
+from collections import namedtuple
+from itertools import chain
+from decimal import Decimal, ROUND_HALF_UP
 import numpy as np
 import pandas as pd
 import gemmi
 from reciprocalspaceship import DataSet
-from reciprocalspaceship.dtypes.base import MTZDtype
+from reciprocalspaceship.dataset import _shift_phases
+from reciprocalspaceship.dtypes import HKLIndexDtype, M_IsymDtype, PhaseDtype
+from reciprocalspaceship.dtypes.base import MTZDtype, MTZIntegerArray, NumpyExtensionArray
+from reciprocalspaceship.utils import hkl_to_asu, hkl_to_key
 
-def from_gemmi(gemmi_mtz):
+def from_gemmi(gemmi_mtz, columns=None):
     """
     Construct DataSet from gemmi.Mtz object
     
@@ -22,26 +28,89 @@ def from_gemmi(gemmi_mtz):
     ----------
     gemmi_mtz : gemmi.Mtz
         gemmi Mtz object
+    columns : str or list of str (optional)
+        Column labels to include in the DataSet. Miller indices and M/ISYM
+        columns are always included. If None, all columns are included.
 
     Returns
     -------
     rs.DataSet
     """
-    dataset = DataSet(spacegroup=gemmi_mtz.spacegroup, cell=gemmi_mtz.cell)
+    mtz_columns = _select_columns(gemmi_mtz.columns, columns)
+    data = np.array(gemmi_mtz, copy=False)
+    dataset = _dataset_from_block(data,
+                                  [ c.idx for c in mtz_columns ],
+                                  [ c.label for c in mtz_columns ],
+                                  [ c.type for c in mtz_columns ],
+                                  gemmi_mtz.spacegroup, gemmi_mtz.cell)
+    return dataset
+
+def _dataset_from_block(data, indices, labels, mtztypes, spacegroup, cell,
+                        merged=None, copy=True):
+    """
+    Construct DataSet from a 2D float32 block of MTZ reflection data.
+
+    Each column of ``data`` listed in ``indices`` is converted to its
+    extension array in a single step -- float columns are copied once
+    into contiguous float32 arrays and integer columns are cast directly
+    to int32 with a missing-value mask -- and the DataSet is constructed
+    from all arrays at once. This avoids the intermediate copies made by
+    inserting and casting columns one at a time.
 
-    # Build up DataSet
-    for c in gemmi_mtz.columns:
-        dataset[c.label] = c.array
+    Parameters
+    ----------
+    data : np.ndarray
+        2D float32 array of shape (n_reflections, n_columns)
+    indices : list of int
+        Indices of columns in ``data`` to include
+    labels : list of str
+        Column labels
+    mtztypes : list of str
+        MTZ column types
+    spacegroup : gemmi.SpaceGroup
+        Space group of the data
+    cell : gemmi.UnitCell
+        Unit cell of the data
+    merged : bool (optional)
+        Whether the data are merged. If None, the data are treated as
+        unmerged if they contain an M/ISYM column and duplicated Miller
+        indices.
+    copy : bool
+        Whether to copy float columns. If False, float columns are strided
+        views into ``data``.
+
+    Returns
+    -------
+    rs.DataSet
+    """
+    arrays = {}
+    for i, label, mtztype in zip(indices, labels, mtztypes):
+        column = data[:, i]
         # Special case for CENTRIC and PARTIAL flags
-        if c.type == "I" and c.label in ["CENTRIC", "PARTIAL"]:
-            dataset[c.label] = dataset[c.label].astype(bool)
+        if mtztype == "I" and label in ["CENTRIC", "PARTIAL"]:
+            arrays[label] = column.astype(bool)
+            continue
+
+        dtype = pd.api.types.pandas_dtype(mtztype)
+        array_type = dtype.construct_array_type()
+        if np.issubdtype(dtype.type, np.integer):
+            mask = np.isnan(column)
+            if mask.any():
+                column = np.where(mask, 0, column)
+            arrays[label] = array_type(column.astype(np.int32), mask)
+        elif copy:
+            arrays[label] = array_type(np.ascontiguousarray(column, dtype=np.float32))
         else:
-            dataset[c.label] = dataset[c.label].astype(c.type)
+            arrays[label] = array_type(column)
+
+    dataset = DataSet(arrays, spacegroup=spacegroup, cell=cell)
     dataset.set_index(["H", "K", "L"], inplace=True)
 
     # Handle unmerged DataSet. Raise ValueError if M/ISYM column is not unique
     m_isym = dataset.get_m_isym_keys()
-    if m_isym and dataset.index.duplicated().any():
+    if merged is None:
+        merged = _is_merged(mtztypes, dataset.get_hkls())
+    if not merged:
         if len(m_isym) == 1:
             dataset.merged = False
             dataset.hkl_to_observed(m_isym[0], inplace=True)
@@ -49,15 +118,56 @@ def from_gemmi(gemmi_mtz):
             raise ValueError("Only a single M/ISYM column is supported for unmerged data")
     else:
         dataset.merged = True
-        
+
     return dataset
 
+def _is_merged(mtztypes, H):
+    """
+    Whether MTZ reflection data are merged. Data are unmerged if they
+    contain an M/ISYM column and duplicated Miller indices.
+
+    Parameters
+    ----------
+    mtztypes : list of str
+        MTZ column types
+    H : np.ndarray
+        n x 3 array of Miller indices
+
+    Returns
+    -------
+    bool
+    """
+    if "Y" not in mtztypes:
+        return True
+    keys = hkl_to_key(H)
+    return len(np.unique(keys)) == len(keys)
+
+def _select_columns(mtz_columns, columns=None):
+    """
+    Return MTZ columns to read, in file order. Miller indices and M/ISYM
+    columns are always returned. Raises ValueError if a requested column
+    label is not in mtz_columns.
+    """
+    if columns is None:
+        return list(mtz_columns)
+    elif isinstance(columns, str):
+        columns = [columns]
+
+    labels = [c.label for c in mtz_columns]
+    missing = [c for c in columns if c not in labels]
+    if missing:
+        raise ValueError(f"Columns {missing} not found in MTZ file. Available columns: {labels}")
+
+    columns = set(columns)
+    return [ c for c in mtz_columns if c.label in columns or c.type in "HY" ]
+
 def to_gemmi(dataset, skip_problem_mtztypes=False):
     """
     Construct gemmi.Mtz object from DataSet
 
     If ``dataset.merged == False``, the reflections will be mapped to the
-    reciprocal space ASU, and a M/ISYM column will be constructed. 
+    reciprocal space ASU, and a M/ISYM column will be constructed. The
+    input DataSet is not modified.
 
     If boolean flags with the label ``PARTIAL`` or ``CENTRIC`` are found
     in the DataSet, these will be cast to the ``MTZInt`` dtype, and included
@@ -86,34 +196,124 @@ def to_gemmi(dataset, skip_problem_mtztypes=False):
     mtz.cell = dataset.cell
     mtz.spacegroup = dataset.spacegroup
 
-    # Handle Unmerged data
-    if not dataset.merged:
-        dataset.hkl_to_asu(inplace=True)
-    
     # Construct data for Mtz object. 
     mtz.add_dataset("reciprocalspaceship")
-    temp = dataset.reset_index()
+    labels, mtztypes, data = _block_from_dataset(dataset, skip_problem_mtztypes)
+    for label, mtztype in zip(labels, mtztypes):
+        mtz.add_column(label=label, type=mtztype)
+    mtz.set_data(data)
+
+    return mtz
+
+def _block_from_dataset(dataset, skip_problem_mtztypes=False):
+    """
+    Return the column labels, MTZ column types, and a 2D float32 block of
+    MTZ reflection data for a DataSet.
+
+    Index levels are included ahead of the DataSet columns, as in
+    ``DataSet.reset_index()``. If ``dataset.merged == False``, Miller
+    indices are mapped to the reciprocal space ASU and an M/ISYM column
+    is constructed, as in ``DataSet.hkl_to_asu()``. Each column is written
+    directly into a preallocated float32 array, and the DataSet is not
+    modified.
+    """
+    # Gather (label, dtype, values, mask) for index levels and columns
     columns = []
-    for c in temp.columns:
-        cseries = temp[c]
-        if isinstance(cseries.dtype, MTZDtype):
-            mtzcol = mtz.add_column(label=c, type=cseries.dtype.mtztype)
-            columns.append(c)
+    index = dataset.index
+    for i, name in enumerate(index.names):
+        if name is None:
+            label = "index" if index.nlevels == 1 else f"level_{i}"
+        else:
+            label = name
+        dtype = dataset._cache_index_dtypes.get(name)
+        dtype = index.dtype if dtype is None and index.nlevels == 1 else dtype
+        dtype = pd.api.types.pandas_dtype(dtype) if dtype is not None else np.dtype(object)
+        if isinstance(index, pd.MultiIndex):
+            codes = index.codes[i]
+            level = index.levels[i]
+            if isinstance(dtype, MTZDtype):
+                level = level.to_numpy(dtype=np.float32)
+            values = np.asarray(level).take(codes) if len(level) else np.zeros(len(codes))
+            mask = codes == -1
+        else:
+            values = index.to_numpy(dtype=np.float32) if isinstance(dtype, MTZDtype) else index.to_numpy()
+            mask = None
+        columns.append([label, dtype, values, mask])
+
+    for i, (label, dtype) in enumerate(dataset.dtypes.items()):
+        array = dataset.iloc[:, i].array
+        if isinstance(array, MTZIntegerArray):
+            values, mask = array._data, array._mask
+        elif isinstance(array, NumpyExtensionArray):
+            values, mask = array.data, None
+        else:
+            values, mask = array.to_numpy(), None
+        columns.append([label, dtype, values, mask])
+
+    # Handle unmerged data
+    if not dataset.merged:
+        columns = _columns_to_asu(columns, dataset.spacegroup)
+
+    labels = []
+    mtztypes = []
+    selected = []
+    for label, dtype, values, mask in columns:
+        if isinstance(dtype, MTZDtype):
+            mtztypes.append(dtype.mtztype)
         # Special case for CENTRIC and PARTIAL flags
-        elif cseries.dtype.name == "bool" and c in ["CENTRIC", "PARTIAL"]:
-            temp[c] = temp[c].astype("MTZInt")
-            mtzcol = mtz.add_column(label=c, type="I")
-            columns.append(c)
+        elif dtype == np.bool_ and label in ["CENTRIC", "PARTIAL"]:
+            mtztypes.append("I")
         elif skip_problem_mtztypes:
             continue
         else:
-            raise ValueError(f"column of type {cseries.dtype} cannot be written to an MTZ file. "
+            raise ValueError(f"column of type {dtype} cannot be written to an MTZ file. "
                              f"To skip columns without explicit MTZ dtypes, set skip_problem_mtztypes=True")
-    mtz.set_data(temp[columns].to_numpy(dtype="float32"))
+        labels.append(label)
+        selected.append((values, mask))
 
-    return mtz
-    
-def read_mtz(mtzfile):
+    data = np.empty((len(dataset), len(selected)), dtype=np.float32)
+    for i, (values, mask) in enumerate(selected):
+        data[:, i] = values
+        if mask is not None:
+            data[mask, i] = np.nan
+
+    return labels, mtztypes, data
+
+def _columns_to_asu(columns, spacegroup):
+    """
+    Map Miller indices in a list of (label, dtype, values, mask) columns to
+    the reciprocal space ASU, shifting phases and constructing an M/ISYM
+    column as in ``DataSet.hkl_to_asu()``.
+    """
+    labels = [ c[0] for c in columns ]
+    hkl = [ labels.index(k) for k in ["H", "K", "L"] ]
+    H = np.column_stack([ columns[i][2] for i in hkl ]).astype(np.int32)
+    H_asu, isym, phi_coeff, phi_shift = hkl_to_asu(H, spacegroup, return_phase_shifts=True)
+
+    columns = [ list(c) for c in columns ]
+    for j, i in enumerate(hkl):
+        columns[i][1] = HKLIndexDtype()
+        columns[i][2] = H_asu[:, j]
+
+    # Apply phase shift
+    for c in columns:
+        if isinstance(c[1], PhaseDtype):
+            c[2] = _shift_phases(c[2], phi_coeff, phi_shift)
+
+    # GH#3: if PARTIAL column exists, use it to construct M/ISYM
+    if "PARTIAL" in labels:
+        partial = columns.pop(labels.index("PARTIAL"))
+        isym = isym + 256*partial[2]
+        labels.remove("PARTIAL")
+    m_isym = [ "M/ISYM", M_IsymDtype(), isym, None ]
+    if "M/ISYM" in labels:
+        columns[labels.index("M/ISYM")] = m_isym
+    else:
+        columns.append(m_isym)
+
+    return columns
+
+def read_mtz(mtzfile, columns=None, mmap=False):
     """
     Populate the dataset object with data from an MTZ reflection file.
 
@@ -131,13 +331,59 @@ def read_mtz(mtzfile):
     ----------
     mtzfile : str or file
         name of an mtz file or a file object
+    columns : str or list of str (optional)
+        Column labels to read from the MTZ file. Only these columns are
+        converted, which reduces the time and memory needed to load files
+        with many columns. Miller indices and M/ISYM columns are always
+        read. If None, all columns are read.
+    mmap : bool
+        Whether to memory-map the reflection data. If True, float columns
+        are views into a copy-on-write mapping of the file, so processes
+        that read the same file share its pages through the OS cache and
+        changes to the DataSet are not written to the file. Integer columns, including Miller indices, are still
+        converted in memory. Requires mtzfile to be a path.
 
     Returns
     -------
     DataSet
+
+    Examples
+    --------
+    >>> ds = rs.read_mtz("unmerged.mtz", columns=["I", "SIGI", "BATCH"])
+    >>> ds = rs.read_mtz("reference.mtz", mmap=True)
     """
+    if mmap:
+        return _read_mtz_mmap(mtzfile, columns=columns)
     gemmi_mtz = gemmi.read_mtz_file(mtzfile)
-    return from_gemmi(gemmi_mtz)
+    return from_gemmi(gemmi_mtz, columns=columns)
+
+def _read_mtz_mmap(mtzfile, columns=None):
+    """
+    Read an MTZ file with the reflection block mapped by numpy.memmap
+    """
+    with open(mtzfile, "rb") as f:
+        header = _read_mtz_header(f)
+    mtz_columns = _select_columns(header["columns"], columns)
+
+    shape = (header["nreflections"], len(header["columns"]))
+    if shape[0] == 0:
+        data = np.empty(shape, dtype=np.float32)
+    else:
+        data = np.memmap(mtzfile, dtype=header["dtype"], mode="c",
+                         offset=header["offset"], shape=shape)
+
+    # Views require native float32 data with NaN as the missing number flag
+    if not data.dtype.isnative:
+        data = data.astype(np.float32)
+    if not np.isnan(header["valm"]):
+        data = np.where(data == header["valm"], np.float32(np.nan), data)
+
+    return _dataset_from_block(data,
+                               [ c.idx for c in mtz_columns ],
+                               [ c.label for c in mtz_columns ],
+                               [ c.type for c in mtz_columns ],
+                               header["spacegroup"], header["cell"],
+                               copy=False)
 
 def write_mtz(dataset, mtzfile, skip_problem_mtztypes=False):
     """
@@ -163,3 +409,326 @@ def write_mtz(dataset, mtzfile, skip_problem_mtztypes=False):
     mtz = to_gemmi(dataset, skip_problem_mtztypes)
     mtz.write_to_file(mtzfile)
     return
+
+#-------------------------------------------------------------------
+# Native MTZ header parsing and chunked I/O
+
+_HeaderColumn = namedtuple("_HeaderColumn", ["label", "type", "idx"])
+
+def _read_mtz_header(f):
+    """
+    Parse the main header of an open MTZ file.
+
+    Returns a dict with the unit cell, space group, columns, number of
+    reflections, missing number flag, and the byte offset and dtype of
+    the reflection block. Raises ValueError if the file is not in MTZ
+    format.
+    """
+    f.seek(0)
+    preamble = f.read(20)
+    if len(preamble) < 20 or preamble[:4] != b"MTZ ":
+        raise ValueError("File is not in MTZ format")
+
+    # Machine stamp gives the byte order of reals and integers
+    real_order = ">" if preamble[8] >> 4 == 1 else "<"
+    int_order = ">" if preamble[9] >> 4 == 1 else "<"
+    header_pos = int(np.frombuffer(preamble, dtype=f"{int_order}i4", count=1, offset=4)[0])
+    if header_pos == -1:
+        header_pos = int(np.frombuffer(preamble, dtype=f"{int_order}i8", count=1, offset=12)[0])
+
+    header = {
+        "cell": None,
+        "spacegroup": None,
+        "columns": [],
+        "nreflections": 0,
+        "valm": np.nan,
+        "offset": 80,
+        "dtype": np.dtype(f"{real_order}f4"),
+    }
+    sgname = None
+    sgnumber = None
+    ops = []
+
+    f.seek(4*(header_pos - 1))
+    while True:
+        record = f.read(80)
+        if len(record) < 80:
+            raise ValueError("MTZ header is truncated")
+        record = record.decode("ascii", errors="replace").rstrip()
+        key = record[:4].upper()
+        args = record.split()[1:]
+        if key == "END":
+            break
+        elif key == "NCOL":
+            header["nreflections"] = int(args[1])
+        elif key == "CELL":
+            header["cell"] = gemmi.UnitCell(*[ float(a) for a in args[:6] ])
+        elif key == "SYMI":
+            sgnumber = int(args[3])
+            if "'" in record:
+                sgname = record.split("'")[1]
+        elif key == "SYMM":
+            ops.append(record[5:].replace(" ", ""))
+        elif key == "VALM" and args[0].upper() != "NAN":
+            header["valm"] = float(args[0])
+        elif key == "COLU":
+            column = _HeaderColumn(args[0], args[1], len(header["columns"]))
+            header["columns"].append(column)
+
+    # Use the space group name if it is consistent with the symmetry
+    # operations, since names do not always specify the setting
+    spacegroup = gemmi.find_spacegroup_by_name(sgname) if sgname else None
+    if ops:
+        ops = gemmi.GroupOps([ gemmi.Op(op) for op in ops ])
+        triplets = { op.triplet() for op in ops }
+        if (spacegroup is None or
+            { op.triplet() for op in spacegroup.operations() } != triplets):
+            spacegroup = gemmi.find_spacegroup_by_ops(ops)
+    if spacegroup is None and sgnumber:
+        spacegroup = gemmi.find_spacegroup_by_number(sgnumber)
+    header["spacegroup"] = spacegroup
+
+    return header
+
+def _read_block(f, header, nrows):
+    """
+    Read nrows reflections from the current position of an open MTZ file
+    as a 2D float32 array. Missing number flags are replaced with NaN.
+    """
+    ncol = len(header["columns"])
+    buffer = f.read(4*ncol*nrows)
+    if len(buffer) < 4*ncol*nrows:
+        raise ValueError("MTZ reflection data is truncated")
+    data = np.frombuffer(buffer, dtype=header["dtype"]).reshape(nrows, ncol)
+    data = data.astype(np.float32, copy=False)
+    if not np.isnan(header["valm"]):
+        data = np.where(data == header["valm"], np.float32(np.nan), data)
+    return data
+
+def read_mtz_chunks(mtzfile, chunksize=2**20, columns=None, merged=None):
+    """
+    Iterate over an MTZ reflection file in chunks of reflections.
+
+    Only one chunk of reflection data is held in memory at a time, so
+    this can be used to process MTZ files that are too large to read at
+    once. Each chunk is a DataSet with the unit cell, space group, and
+    merged status of the file. For unmerged data, the Miller indices of
+    each chunk are mapped to their observed values and a ``PARTIAL``
+    column is added, as in :func:`read_mtz`.
+
+    Parameters
+    ----------
+    mtzfile : str
+        name of an mtz file
+    chunksize : int
+        Number of reflections per chunk
+    columns : str or list of str (optional)
+        Column labels to read from the MTZ file. Miller indices and M/ISYM
+        columns are always read. If None, all columns are read.
+    merged : bool (optional)
+        Whether the MTZ file contains merged data. If None, the rule of
+        :func:`read_mtz` is applied to the first chunk: files with an
+        M/ISYM column and duplicated Miller indices in the first chunk are
+        read as unmerged data. Unmerged files whose first chunk has no
+        duplicated Miller indices should be read with ``merged=False``.
+
+    Yields
+    ------
+    DataSet
+
+    Examples
+    --------
+    >>> for chunk in rs.io.read_mtz_chunks("unmerged.mtz", chunksize=100000):
+    ...     print(chunk["I"].mean())
+    """
+    if chunksize < 1:
+        raise ValueError(f"chunksize must be a positive integer -- found: {chunksize}")
+
+    with open(mtzfile, "rb") as f:
+        header = _read_mtz_header(f)
+        mtz_columns = _select_columns(header["columns"], columns)
+        indices = [ c.idx for c in mtz_columns ]
+        labels = [ c.label for c in mtz_columns ]
+        mtztypes = [ c.type for c in mtz_columns ]
+        nreflections = header["nreflections"]
+
+        def read_blocks():
+            f.seek(header["offset"])
+            for start in range(0, nreflections, chunksize):
+                yield _read_block(f, header, min(chunksize, nreflections - start))
+
+        # Merged status is inferred from the first chunk, so that memory
+        # use does not depend on the size of the file
+        blocks = read_blocks()
+        if merged is None and nreflections > 0:
+            first = next(blocks)
+            hkl = [ indices[labels.index(label)] for label in ["H", "K", "L"] ]
+            merged = _is_merged(mtztypes, first[:, hkl])
+            blocks = chain([first], blocks)
+
+        for data in blocks:
+            yield _dataset_from_block(data, indices, labels, mtztypes,
+                                      header["spacegroup"], header["cell"],
+                                      merged=merged)
+
+class MTZWriter:
+    """
+    Incrementally write DataSet chunks to an MTZ reflection file.
+
+    Reflection data are appended to the output file as each chunk is
+    written, and the MTZ header is written when the writer is closed. The
+    unit cell, space group, merged status, and columns are taken from
+    the first chunk, and subsequent chunks must match them. Unmerged
+    chunks are mapped to the reciprocal space ASU, as in :func:`write_mtz`.
+
+    Parameters
+    ----------
+    mtzfile : str
+        name of the output mtz file
+    skip_problem_mtztypes : bool
+        Whether to skip columns in DataSet that do not have specified
+        MTZ datatypes
+
+    Examples
+    --------
+    >>> with rs.io.MTZWriter("scaled.mtz") as writer:
+    ...     for chunk in rs.io.read_mtz_chunks("unmerged.mtz"):
+    ...         writer.write(scale(chunk))
+    """
+    def __init__(self, mtzfile, skip_problem_mtztypes=False):
+        self.skip_problem_mtztypes = skip_problem_mtztypes
+        self.nreflections = 0
+        self.cell = None
+        self.spacegroup = None
+        self.merged = None
+        self._labels = None
+        self._mtztypes = None
+        self._min = None
+        self._max = None
+        self._min_1_d2 = np.inf
+        self._max_1_d2 = -np.inf
+        self._file = open(mtzfile, "wb")
+        self._file.write(bytes(80))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def write(self, dataset):
+        """
+        Append the reflections in a DataSet to the MTZ file.
+
+        Parameters
+        ----------
+        dataset : rs.DataSet
+            DataSet chunk to write
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed MTZWriter")
+        if not dataset.cell:
+            raise AttributeError(f"Instance of type {dataset.__class__.__name__} has no unit cell information")
+        if not dataset.spacegroup:
+            raise AttributeError(f"Instance of type {dataset.__class__.__name__} has no space group information")
+
+        labels, mtztypes, data = _block_from_dataset(dataset, self.skip_problem_mtztypes)
+
+        if self._labels is None:
+            self.cell = dataset.cell
+            self.spacegroup = dataset.spacegroup
+            self.merged = dataset.merged
+            self._labels = labels
+            self._mtztypes = mtztypes
+            self._min = np.full(len(labels), np.nan, dtype=np.float32)
+            self._max = np.full(len(labels), np.nan, dtype=np.float32)
+        elif labels != self._labels or mtztypes != self._mtztypes:
+            raise ValueError(f"DataSet columns {list(zip(labels, mtztypes))} do not match "
+                             f"previously written columns {list(zip(self._labels, self._mtztypes))}")
+        elif (dataset.spacegroup.xhm() != self.spacegroup.xhm() or
+              not np.allclose(dataset.cell.parameters, self.cell.parameters) or
+              dataset.merged != self.merged):
+            raise ValueError("DataSet cell, spacegroup, and merged status must match previously written chunks")
+
+        self._file.write(data.astype("<f4", copy=False).tobytes())
+        self.nreflections += len(data)
+
+        # Track column ranges and resolution for the MTZ header
+        if len(data) > 0:
+            self._min = np.fmin(self._min, np.fmin.reduce(data, axis=0))
+            self._max = np.fmax(self._max, np.fmax.reduce(data, axis=0))
+            hkl = [ i for i, t in enumerate(mtztypes) if t == "H" ]
+            B = np.array(self.cell.fractionalization_matrix.tolist())
+            inv_d2 = np.square(data[:, hkl].astype(np.float64) @ B).sum(-1)
+            self._min_1_d2 = min(self._min_1_d2, inv_d2.min())
+            self._max_1_d2 = max(self._max_1_d2, inv_d2.max())
+
+    def close(self):
+        """
+        Write the MTZ header and close the file.
+        """
+        if self.closed:
+            return
+        if self._labels is None:
+            self._file.close()
+            raise ValueError("Cannot write MTZ file without any reflection data")
+
+        header_pos = self._file.tell()//4 + 1
+        self._file.write(self._header_records())
+        self._file.seek(0)
+        self._file.write(b"MTZ " + np.array(header_pos, dtype="<i4").tobytes() + b"DA\x00\x00")
+        self._file.close()
+
+    def _header_records(self):
+        """Return MTZ header records as bytes"""
+        def fmt(value):
+            # gemmi rounds ties half up, rather than to even
+            if np.isnan(value):
+                return f"{'NaN':>17}"
+            value = Decimal(float(value)).quantize(Decimal("1e-9"), rounding=ROUND_HALF_UP)
+            return f"{value:17.9f}"
+
+        cell = self.cell.parameters
+        sg = self.spacegroup
+        hm = "H" + sg.hm[1:] if sg.ext == "H" else sg.hm
+        sgname = f"'{hm}'"
+        pointgroup = "PG" + sg.point_group_hm().replace(" ", "")
+        ops = sg.operations()
+        if self.nreflections > 0:
+            reso = (self._min_1_d2, self._max_1_d2)
+        else:
+            reso = (0., 0.)
+
+        records = [
+            "VERS MTZ:V1.1",
+            "TITLE ",
+            f"NCOL {len(self._labels):8d} {self.nreflections:12d} {0:8d}",
+            "CELL {:10.4f} {:9.4f} {:9.4f} {:9.4f} {:9.4f} {:9.4f}".format(*cell),
+            f"SORT {0:4d} {0:3d} {0:3d} {0:3d} {0:3d}",
+            f"SYMINF {len(list(ops)):3d} {len(ops.sym_ops):2d} {hm[0]} {sg.ccp4:5d} {sgname:>22} {pointgroup}",
+        ]
+        records += [ f"SYMM {op.triplet().upper()}" for op in ops ]
+        records += [
+            f"RESO {reso[0]:<20.12f} {reso[1]:<20.12f}",
+            "VALM NAN",
+        ]
+        for label, mtztype, vmin, vmax in zip(self._labels, self._mtztypes, self._min, self._max):
+            records.append(f"COLUMN {label:<30} {mtztype} {fmt(vmin)} {fmt(vmax)} {0:4d}")
+        records += [
+            f"NDIF {1:8d}",
+            f"PROJECT {0:7d} reciprocalspaceship",
+            f"CRYSTAL {0:7d} reciprocalspaceship",
+            f"DATASET {0:7d} reciprocalspaceship",
+            "DCELL {:9d} {:10.4f} {:9.4f} {:9.4f} {:9.4f} {:9.4f} {:9.4f}".format(0, *cell),
+            f"DWAVEL {0:8d} {0.:10.5f}",
+            "END",
+            "MTZENDOFHEADERS",
+        ]
+        return "".join([ f"{r:<80}"[:80] for r in records ]).encode("ascii")
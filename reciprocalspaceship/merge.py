@@ -0,0 +1,329 @@
+import numpy as np
+import pandas as pd
+import reciprocalspaceship as rs
+from reciprocalspaceship.dataset import _hkl_multiindex, _take
+from reciprocalspaceship.dtypes import HKLIndexDtype
+from reciprocalspaceship.utils import hkl_to_key, key_to_hkl
+from reciprocalspaceship.utils.hklkey import _lookup_keys
+
+def merge_many(objs, how="outer", suffixes=None, check_isomorphous=True):
+    """
+    Merge the columns of many DataSets on their Miller indices.
+
+    For DataSets indexed by unique Miller indices, this gives the same rows
+    and columns as ``objs[0].join(objs[1:], how=how)``, but is much faster
+    for many DataSets. Rows are in the order of the first DataSet for
+    ``how="inner"`` and ``how="left"``, as for ``ReflectionAligner``, and
+    sorted by Miller index for ``how="outer"``.
+    Isomorphism is checked once against the first DataSet, the union (or
+    intersection) of Miller indices is found with a single sort, and each
+    column is written once into an output array. Missing reflections are
+    filled with NaN. Attributes (such as `cell` and `spacegroup`) are
+    inherited from the first DataSet.
+
+    Parameters
+    ----------
+    objs : list of rs.DataSet
+        DataSets with an H, K, L MultiIndex and no repeated Miller indices
+    how : str ["outer", "inner", or "left"]
+        If "outer", the result contains the union of Miller indices,
+        sorted by Miller index in the order of the index levels of the
+        first DataSet. If "inner", the result contains Miller indices
+        found in every DataSet, in the order of the first DataSet. If
+        "left", the result contains the Miller indices of the first
+        DataSet, in its order.
+    suffixes : list of str
+        Suffixes to append to the column labels of each DataSet. If None,
+        column labels must be unique across DataSets.
+    check_isomorphous : bool
+        If True, the cell and spacegroup of each DataSet are compared to
+        those of the first DataSet to ensure they are isomorphous
+
+    Returns
+    -------
+    rs.DataSet
+
+    Raises
+    ------
+    ValueError
+        If DataSets are not isomorphous, are not indexed by unique Miller
+        indices, or have overlapping column labels
+
+    See Also
+    --------
+    DataSet.join : Join DataSets on their indices
+    concat : Concatenate ``rs`` objects
+    """
+    objs = list(objs)
+    if len(objs) == 0:
+        raise ValueError("No DataSets to merge")
+    if how not in ("outer", "inner", "left"):
+        raise ValueError(f"how must be 'outer', 'inner', or 'left' -- found '{how}'")
+    if suffixes is not None and len(suffixes) != len(objs):
+        raise ValueError(f"Expected {len(objs)} suffixes -- found {len(suffixes)}")
+
+    first = objs[0]
+    names = list(first.index.names)
+    for obj in objs:
+        if not isinstance(obj, rs.DataSet):
+            raise ValueError(f"Expected rs.DataSet -- found {type(obj)}")
+        if sorted(obj.index.names, key=str) != ["H", "K", "L"]:
+            raise ValueError(f"DataSets must be indexed by H, K, and L -- found "
+                             f"{list(obj.index.names)}")
+        if check_isomorphous and not first.is_isomorphous(obj):
+            raise ValueError("Provided DataSets are not isomorphous")
+
+    labels = []
+    for i, obj in enumerate(objs):
+        suffix = "" if suffixes is None else suffixes[i]
+        labels.extend([ f"{c}{suffix}" for c in obj.columns ])
+    if len(set(labels)) != len(labels):
+        raise ValueError("Column labels of DataSets overlap. Please provide "
+                         "suffixes or rename columns")
+
+    # Keys sort in the order of the index levels of the first DataSet
+    order = [ ["H", "K", "L"].index(k) for k in names ]
+    keys = [ hkl_to_key(obj.get_hkls()[:, order]) for obj in objs ]
+    lengths = [ len(k) for k in keys ]
+    if how == "left":
+        union = keys[0]
+        try:
+            positions = [ _lookup_keys(k, union) for k in keys ]
+        except ValueError:
+            raise ValueError("DataSets must not contain repeated Miller indices")
+    else:
+        union, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+        positions = np.split(inverse, np.cumsum(lengths)[:-1])
+        if how == "inner":
+            # Keep Miller indices found in every DataSet, in the order of
+            # the first DataSet
+            present = np.bincount(inverse, minlength=len(union)) == len(objs)
+            order = positions[0][present[positions[0]]]
+            remap = np.full(len(union), -1, dtype=np.intp)
+            remap[order] = np.arange(len(order))
+            union = union[order]
+            positions = [ remap[pos] for pos in positions ]
+
+    # Indexer of each DataSet for rows of the result, with -1 for
+    # missing reflections
+    data = {}
+    labels = iter(labels)
+    for obj, pos in zip(objs, positions):
+        indexer = np.full(len(union), -1, dtype=np.intp)
+        valid = pos >= 0
+        indexer[pos[valid]] = np.flatnonzero(valid)
+        if np.count_nonzero(indexer >= 0) != np.count_nonzero(valid):
+            raise ValueError("DataSets must not contain repeated Miller indices")
+        for i in range(obj.shape[1]):
+            data[next(labels)] = _take(obj.iloc[:, i].array, indexer)
+
+    hkls = key_to_hkl(union)
+    if len(union) > 0:
+        index = _hkl_multiindex([hkls[:, i] for i in range(3)], names)
+    else:
+        index = pd.MultiIndex.from_arrays([hkls[:, i] for i in range(3)], names=names)
+    result = rs.DataSet(data, index=index).__finalize__(first)
+    result._cache_index_dtypes = { k: HKLIndexDtype.name for k in names }
+    return result
+
+
+class ReflectionAligner:
+    """
+    Align the reflections of two DataSets by their Miller indices.
+
+    Miller indices are packed into 64-bit keys and matched with a single
+    sort, and the resulting indexers can be applied to any number of
+    columns of either DataSet. This is useful when the same two sets of
+    reflections are compared many times, for example to compute
+    differences between subsets of columns of isomorphous DataSets.
+
+    Rows are in the order of the left reflections for ``how="left"`` and
+    ``how="inner"``, the order of the right reflections for
+    ``how="right"``, and sorted by Miller index for ``how="outer"``, as
+    for ``merge_many``. This matches ``DataSet.join()`` for DataSets
+    without repeated Miller indices. Reflections whose Miller indices are
+    not in the other DataSet are filled with NaN (or NA for integer
+    columns).
+
+    Parameters
+    ----------
+    left : rs.DataSet or array
+        DataSet or n x 3 array of Miller indices
+    right : rs.DataSet or array
+        DataSet or n x 3 array of Miller indices
+    how : str ["inner", "outer", "left", or "right"]
+        Which reflections to keep. Only the left reflections may contain
+        repeated Miller indices, and only if `how` is "left" or "inner".
+        The right reflections may only contain repeated Miller indices if
+        `how` is "right"
+
+    Attributes
+    ----------
+    left_indexer : np.ndarray
+        Row of `left` for each aligned reflection, or -1 if missing
+    right_indexer : np.ndarray
+        Row of `right` for each aligned reflection, or -1 if missing
+    keys : np.ndarray
+        Packed Miller indices of the aligned reflections
+
+    Raises
+    ------
+    ValueError
+        If Miller indices are repeated where not supported
+
+    Examples
+    --------
+    >>> aligner = rs.ReflectionAligner(ds1, ds2)
+    >>> diff = aligner.take_left(ds1["F"]) - aligner.take_right(ds2["F"])
+
+    See Also
+    --------
+    merge_many : Merge the columns of many DataSets on their Miller indices
+    """
+    def __init__(self, left, right, how="inner"):
+        if how not in ("inner", "outer", "left", "right"):
+            raise ValueError(f"how must be 'inner', 'outer', 'left', or 'right' -- found '{how}'")
+        self.how = how
+        self.names = ["H", "K", "L"]
+        if isinstance(left, rs.DataSet) and sorted(left.index.names, key=str) == self.names:
+            self.names = list(left.index.names)
+
+        left_keys = self._get_keys(left)
+        right_keys = self._get_keys(right)
+        self._shape = (len(left_keys), len(right_keys))
+        try:
+            if how == "left":
+                self.left_indexer = np.arange(len(left_keys))
+                self.right_indexer = _lookup_keys(left_keys, right_keys)
+                self.keys = left_keys
+            elif how == "right":
+                self.left_indexer = _lookup_keys(right_keys, left_keys)
+                self.right_indexer = np.arange(len(right_keys))
+                self.keys = right_keys
+            elif how == "inner":
+                pos = _lookup_keys(left_keys, right_keys)
+                self.left_indexer = np.flatnonzero(pos >= 0)
+                self.right_indexer = pos[self.left_indexer]
+                self.keys = left_keys[self.left_indexer]
+            else:
+                self.keys = np.union1d(left_keys, right_keys)
+                if len(self.keys) < max(len(left_keys), len(right_keys)):
+                    raise ValueError("Miller indices must not be repeated")
+                self.left_indexer = _lookup_keys(self.keys, left_keys)
+                self.right_indexer = _lookup_keys(self.keys, right_keys)
+        except ValueError:
+            raise ValueError(f"Repeated Miller indices are not supported for how='{how}'")
+
+    @staticmethod
+    def _get_keys(obj):
+        if isinstance(obj, rs.DataSet):
+            return hkl_to_key(obj.get_hkls())
+        return hkl_to_key(obj)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get_hkls(self):
+        """
+        Get the Miller indices of the aligned reflections.
+
+        Returns
+        -------
+        hkl : ndarray, shape=(n_reflections, 3)
+            Miller indices of aligned reflections
+        """
+        return key_to_hkl(self.keys)
+
+    @property
+    def index(self):
+        """MultiIndex of the Miller indices of the aligned reflections"""
+        hkls = self.get_hkls()
+        order = [ ["H", "K", "L"].index(k) for k in self.names ]
+        arrays = [ hkls[:, i] for i in order ]
+        if len(hkls) > 0:
+            return _hkl_multiindex(arrays, self.names)
+        return pd.MultiIndex.from_arrays(arrays, names=self.names)
+
+    def take_left(self, values):
+        """
+        Align values of the left DataSet with the aligned reflections.
+
+        Parameters
+        ----------
+        values : rs.DataSeries, np.ndarray, or ExtensionArray
+            Values with one entry per row of the left DataSet
+
+        Returns
+        -------
+        np.ndarray or ExtensionArray
+        """
+        return self._take_values(values, self.left_indexer)
+
+    def take_right(self, values):
+        """
+        Align values of the right DataSet with the aligned reflections.
+
+        Parameters
+        ----------
+        values : rs.DataSeries, np.ndarray, or ExtensionArray
+            Values with one entry per row of the right DataSet
+
+        Returns
+        -------
+        np.ndarray or ExtensionArray
+        """
+        return self._take_values(values, self.right_indexer)
+
+    @staticmethod
+    def _take_values(values, indexer):
+        if isinstance(values, pd.Series):
+            values = values.array
+        elif not isinstance(values, pd.api.extensions.ExtensionArray):
+            values = np.asarray(values)
+        if isinstance(values, pd.arrays.PandasArray):
+            values = values.to_numpy()
+        return _take(values, indexer)
+
+    def join(self, left, right, lsuffix="", rsuffix=""):
+        """
+        Join the columns of two DataSets on the aligned reflections.
+
+        Parameters
+        ----------
+        left : rs.DataSet
+            DataSet with the reflections used as `left`
+        right : rs.DataSet
+            DataSet with the reflections used as `right`
+        lsuffix : str
+            Suffix to append to column labels of `left`
+        rsuffix : str
+            Suffix to append to column labels of `right`
+
+        Returns
+        -------
+        rs.DataSet
+            DataSet indexed by the aligned Miller indices, with attributes
+            (such as `cell` and `spacegroup`) from `left`
+
+        Raises
+        ------
+        ValueError
+            If the DataSets do not match the aligned reflections, or column
+            labels overlap
+        """
+        if (len(left), len(right)) != self._shape:
+            raise ValueError("DataSets do not match the aligned reflections")
+
+        data = {}
+        for obj, indexer, suffix in [(left, self.left_indexer, lsuffix),
+                                     (right, self.right_indexer, rsuffix)]:
+            for i, label in enumerate(obj.columns):
+                label = f"{label}{suffix}"
+                if label in data:
+                    raise ValueError(f"Column label '{label}' overlaps. Please provide "
+                                     f"suffixes or rename columns")
+                data[label] = self._take_values(obj.iloc[:, i], indexer)
+
+        result = rs.DataSet(data, index=self.index).__finalize__(left)
+        result._cache_index_dtypes = { k: HKLIndexDtype.name for k in self.names }
+        return result
@@ -4,8 +4,9 @@ from .structurefactors import (to_structurefactor,
                                compute_structurefactor_multiplicity,
                                is_centric,
                                is_absent)
-from .symop import apply_to_hkl, phase_shift
+from .symop import apply_to_hkl, apply_to_hkl_batch, apply_rotations, phase_shift, get_symop_tensors
+from .hklkey import hkl_to_key, key_to_hkl
 from .rfree import add_rfree, copy_rfree
-from .asu import hkl_to_asu, hkl_to_observed, in_asu
+from .asu import hkl_to_asu, hkl_to_observed, in_asu, ASUMap, get_asu_map
 from .cell import compute_dHKL
 from .binning import bin_by_percentile
@@ -1,6 +1,6 @@
+from collections import OrderedDict
 import numpy as np
-from gemmi import SpaceGroup,GroupOps
-from reciprocalspaceship.utils import apply_to_hkl, phase_shift, is_centric
+from reciprocalspaceship.utils.symop import get_symop_tensors
 
 ccp4_hkl_asu = [
   0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,  2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,  
@@ -42,17 +42,25 @@ def in_asu(H, spacegroup):
     result : array
         Array of bools with length n. 
     """
-    h,k,l = H.T
-    H_ref = np.zeros(H.shape, dtype=H.dtype)
-    basis_op = spacegroup.basisop
-    for i,h in enumerate(H):
-        H_ref[i] = basis_op.apply_to_hkl(h)
-    idx = ccp4_hkl_asu[spacegroup.number-1] 
-    return asu_cases[idx](*H_ref.T)
-
-def hkl_to_asu(H, spacegroup, return_phase_shifts=False):
+    ops = get_symop_tensors(spacegroup)
+    H_ref = np.floor_divide(np.matmul(H, ops.basis_rot), ops.basis_den)
+    return asu_cases[ops.asu_case](*H_ref.T)
+
+def hkl_to_asu(H, spacegroup, return_phase_shifts=False, chunksize=2**20):
     """
     Map hkls to the asymmetric unit and optionally return shifts for the associated phases.
+
+    Miller indices are processed in chunks of at most `chunksize` rows to
+    bound the memory used for intermediate results. For each Miller index,
+    symmetry operators are tried in order and the first one that maps it
+    into the asymmetric unit is used. Miller indices that no operator
+    maps into the asymmetric unit are returned unchanged with an ISYM of
+    1, the identity operator.
+
+    If all Miller indices fall within a small enough box around the
+    origin, the mapping is instead read from a cached :class:`ASUMap`
+    lookup table (see :func:`get_asu_map`). Both approaches give
+    identical results.
     
     Examples
     --------
@@ -68,6 +76,9 @@ def hkl_to_asu(H, spacegroup, return_phase_shifts=False):
         The space group to identify the asymmetric unit
     return_phase_shifts : bool (optional)
         If True, return the phase shift and phase multiplier to apply to each miller index
+    chunksize : int or None (optional)
+        Maximum number of Miller indices to process at once. If None, all
+        Miller indices are processed at once.
 
     Returns
     -------
@@ -81,41 +92,78 @@ def hkl_to_asu(H, spacegroup, return_phase_shifts=False):
     phi_shift : array (optional)
         an array length n containing phase shifts in degrees
     """
-    basis_op = spacegroup.basisop
-    group_ops = spacegroup.operations()
-    num_ops = len(group_ops)
-
-    #This array contains all alternative mappings for the input array H
-    R = np.zeros((len(H), 3, 2*num_ops))
-    for i,op in enumerate(group_ops):
-        R[:,:,2*i] = apply_to_hkl(H, op)
-        #Every other op goes through Friedel symmetry
-        R[:,:,2*i+1] = -R[:,:,2*i]
-
-    asu_case_index = ccp4_hkl_asu[spacegroup.number-1]
+    ops = get_symop_tensors(spacegroup)
+    H = np.asarray(H).reshape(-1, 3).astype(np.int32)
+    if chunksize is not None and chunksize < 1:
+        raise ValueError(f"chunksize must be a positive integer. Received: {chunksize}")
+
+    asu_map = _find_asu_map(H, spacegroup)
+    if asu_map is not None:
+        return asu_map.lookup(H, return_phase_shifts)
+    return _map_to_asu(H, ops, return_phase_shifts, chunksize)
+
+def _map_to_asu(H, ops, return_phase_shifts, chunksize=None):
+    """
+    Map int32 Miller indices to the asymmetric unit by trying symmetry
+    operators in order, processing at most `chunksize` rows at a time.
+    See hkl_to_asu() for a description of the returned arrays.
+    """
+    n = len(H)
+
+    H_asu = np.zeros((n, 3), dtype=int)
+    isym = np.zeros(n, dtype=int)
+    if return_phase_shifts:
+        phi_coeff = np.zeros(n)
+        phi_shift = np.zeros(n)
+
+    if chunksize is None:
+        chunksize = max(n, 1)
+
+    # The basis op is the identity for most space groups
+    basis_rot = ops.basis_rot
+    if np.array_equal(basis_rot, ops.basis_den*np.eye(3)):
+        basis_rot = None
+
     #The case function tells if a given hkl is in the reciprocal space asu
-    in_asu = asu_cases[asu_case_index]
+    in_asu = asu_cases[ops.asu_case]
 
-    #This is an N x 3 x num_ops array which has True everywhere an op maps to the asu
-    idx = np.vstack([in_asu(*apply_to_hkl(R[:,:,i], basis_op).T) for i in range(2*num_ops)]).T
+    # Centering operators repeat the rotations of the primitive operators,
+    # so the first operator mapping to the asu is always a primitive one
+    for start in range(0, n, chunksize):
+        remaining = np.arange(start, min(start+chunksize, n))
+        for i in range(ops.num_sym_ops):
+            h = np.floor_divide(H[remaining] @ ops.rot[i], ops.den)
 
-    #Centric ops map to the asu more than once, so we need to account for that by unsetting all 
-    #indexes after the first successful one
-    idx[np.cumsum(idx, -1) > 1] = False 
+            #Every other op goes through Friedel symmetry
+            for sign in (1, -1):
+                if sign == -1:
+                    h = -h
+                h_ref = h if basis_rot is None else np.floor_divide(h @ basis_rot, ops.basis_den)
+                found = in_asu(*h_ref.T)
+                rows = remaining[found]
+                H_asu[rows] = h[found]
+                isym[rows] = 2*i + (1 if sign == 1 else 2)
+                if return_phase_shifts:
+                    phi_coeff[rows] = sign
+                    phi_shift[rows] = -2*np.pi*(H[rows] @ ops.tran[i]) / ops.den
 
-    H_asu = R.swapaxes(1, 2)[idx].astype(int)
-    isym = np.argwhere(idx)[:,1] + 1
+                remaining = remaining[~found]
+                h = h[~found]
+
+            if len(remaining) == 0:
+                break
+
+        # Miller indices that are not mapped by any operator (such as
+        # absences that are non-integral in the reference setting) keep
+        # the identity operator, so that the outputs stay aligned with H.
+        # The argmax-based implementation this replaced dropped them instead.
+        H_asu[remaining] = H[remaining]
+        isym[remaining] = 1
+        if return_phase_shifts:
+            phi_coeff[remaining] = 1.
 
     if return_phase_shifts:
-        phi_shift = np.zeros((len(H), 2*num_ops))
-        phi_coeff = np.ones((len(H), 2*num_ops))
-        for i,op in enumerate(group_ops):
-            phi_shift[:,2*i] = phase_shift(H, op)
-            phi_shift[:,2*i+1] = phi_shift[:,2*i]
-            phi_coeff[:,2*i+1] = -1.
-        phi_coeff = phi_coeff[idx]
-        phi_shift = np.rad2deg(phi_shift[idx])
-        return H_asu, isym, phi_coeff, phi_shift
+        return H_asu, isym, phi_coeff, np.rad2deg(phi_shift)
     else:
         return H_asu, isym
 
@@ -147,31 +195,178 @@ def hkl_to_observed(H, isym, sg, return_phase_shifts=False):
         an array length n containing -1. or 1. for each H
     phi_shift : array (optional)
         an array length n containing phase shifts in degrees
-    """
 
-    H = np.array(H, dtype=np.float32)
-    isym = np.array(isym, dtype=int)
-    observed_H = np.zeros_like(H)
+    Raises
+    ------
+    ValueError
+        If isym does not correspond to a symmetry operator of sg
+    """
+    ops = get_symop_tensors(sg)
+    H = np.asarray(H).reshape(-1, 3).astype(np.int32)
+    isym = np.asarray(isym, dtype=np.int32).reshape(-1)
+    if len(isym) and ((isym < 1).any() or (isym > 2*len(ops)).any()):
+        raise ValueError(f"isym values must be between 1 and {2*len(ops)} for "
+                         f"spacegroup {sg.xhm()}")
 
-    if return_phase_shifts:
-        phi_coeff = np.zeros(len(H))
-        phi_shift = np.zeros(len(H))
+    # Odd isym values correspond to symmetry operators, and even values to
+    # the Friedel mates of the preceding operator
+    op_index = (isym - 1) // 2
+    friedel = (isym % 2) == 0
 
-    for i,op in enumerate(sg.operations()):
-        op = op.inverse()
-        idx = (isym == i*2+1)
-        observed_H[idx] = apply_to_hkl(H[idx], op)
-        if return_phase_shifts:
-            phi_shift[idx] = phase_shift(H[idx], op)
-            phi_coeff[idx] = 1.
-        #Friedel
-        idx = (isym == i*2+2)
-        observed_H[idx] = apply_to_hkl(H[idx], op.negated())
-        if return_phase_shifts:
-            phi_shift[idx] = phase_shift(H[idx], op)
-            phi_coeff[idx] = -1.
+    # Gather the inverse operator of each row and apply all at once
+    rot = ops.inv_rot[op_index]
+    signed_H = np.where(friedel[:, None], -H, H)
+    observed_H = np.floor_divide(np.matmul(signed_H[:, None, :], rot)[:, 0, :], ops.den)
 
     if return_phase_shifts:
+        tran = ops.inv_tran[op_index]
+        phi_shift = -2*np.pi*np.einsum("nj,nj->n", H, tran) / ops.den
+        phi_coeff = np.where(friedel, -1., 1.)
         return observed_H, phi_coeff, np.rad2deg(phi_shift)
     return observed_H
 
+class ASUMap:
+    """
+    Lookup table mapping Miller indices to the reciprocal space asymmetric unit.
+
+    The table stores the result of :func:`hkl_to_asu` for every Miller
+    index with ``abs(h) <= hmax[0]``, ``abs(k) <= hmax[1]``, and
+    ``abs(l) <= hmax[2]``. Mapping Miller indices within this box to the
+    asymmetric unit then requires a single gather from the table.
+
+    Parameters
+    ----------
+    spacegroup : gemmi.SpaceGroup
+        The space group to identify the asymmetric unit
+    hmax : array-like of int
+        Largest absolute values of h, k, and l covered by the table
+
+    See Also
+    --------
+    get_asu_map : Get a cached ASUMap for a space group
+    """
+    def __init__(self, spacegroup, hmax):
+        self.spacegroup = spacegroup
+        self.hmax = np.array(hmax, dtype=np.int32).reshape(3)
+        self.shape = tuple(2*self.hmax + 1)
+
+        H = np.indices(self.shape, dtype=np.int32).reshape(3, -1).T - self.hmax
+        H_asu, isym, phi_coeff, phi_shift = _map_to_asu(
+            H, get_symop_tensors(spacegroup), return_phase_shifts=True, chunksize=2**20
+        )
+        self.H_asu = H_asu.astype(np.int32)
+        self.isym = isym.astype(np.uint8)
+        self.phi_coeff = phi_coeff.astype(np.int8)
+        self.phi_shift = phi_shift
+        for array in (self.H_asu, self.isym, self.phi_coeff, self.phi_shift):
+            array.setflags(write=False)
+
+    def __len__(self):
+        return len(self.isym)
+
+    def covers(self, H):
+        """
+        Determine whether all Miller indices are within the table.
+
+        Parameters
+        ----------
+        H : array
+            n x 3 array of Miller indices
+
+        Returns
+        -------
+        bool
+        """
+        return bool((np.abs(H) <= self.hmax).all())
+
+    def lookup(self, H, return_phase_shifts=False):
+        """
+        Map Miller indices to the asymmetric unit using the table.
+
+        Parameters
+        ----------
+        H : array
+            n x 3 array of Miller indices within the table
+        return_phase_shifts : bool (optional)
+            If True, return the phase shift and phase multiplier to apply to each miller index
+
+        Returns
+        -------
+        H_asu, isym[, phi_coeff, phi_shift] : arrays
+            Same as :func:`hkl_to_asu`
+
+        Raises
+        ------
+        ValueError
+            If any Miller index is outside of the table
+        """
+        H = np.asarray(H).reshape(-1, 3)
+        idx = np.ravel_multi_index((H + self.hmax).T, self.shape)
+        H_asu = self.H_asu[idx].astype(int)
+        isym = self.isym[idx].astype(int)
+        if return_phase_shifts:
+            phi_coeff = self.phi_coeff[idx].astype(float)
+            phi_shift = self.phi_shift[idx]
+            return H_asu, isym, phi_coeff, phi_shift
+        return H_asu, isym
+
+# Most recently used ASUMap objects, keyed by Hall symbol and hmax
+_asu_map_cache = OrderedDict()
+_asu_map_cache_size = 4
+
+# Largest table built automatically by hkl_to_asu()
+_asu_map_max_size = 2**21
+
+def get_asu_map(spacegroup, hmax):
+    """
+    Get an :class:`ASUMap` covering Miller indices up to `hmax`.
+
+    A cached table is returned if one exists for the space group that
+    covers the requested box. Otherwise, a new table is built and cached.
+    Cached tables are used automatically by :func:`hkl_to_asu`.
+
+    Parameters
+    ----------
+    spacegroup : gemmi.SpaceGroup
+        The space group to identify the asymmetric unit
+    hmax : array-like of int
+        Largest absolute values of h, k, and l to cover
+
+    Returns
+    -------
+    ASUMap
+    """
+    hmax = np.array(hmax, dtype=np.int32).reshape(3)
+    asu_map = _cached_asu_map(spacegroup, hmax)
+    if asu_map is None:
+        asu_map = ASUMap(spacegroup, hmax)
+        _asu_map_cache[(spacegroup.hall, tuple(hmax))] = asu_map
+        if len(_asu_map_cache) > _asu_map_cache_size:
+            _asu_map_cache.popitem(last=False)
+    return asu_map
+
+def _cached_asu_map(spacegroup, hmax):
+    """Return a cached ASUMap for spacegroup that covers hmax, or None"""
+    hall = spacegroup.hall
+    for key, asu_map in reversed(_asu_map_cache.items()):
+        if key[0] == hall and (hmax <= asu_map.hmax).all():
+            _asu_map_cache.move_to_end(key)
+            return asu_map
+    return None
+
+def _find_asu_map(H, spacegroup):
+    """
+    Return an ASUMap to use for H, or None. A new table is only built if
+    it has no more entries than H has rows.
+    """
+    if len(H) == 0:
+        return None
+    hmax = np.abs(H).max(0)
+    asu_map = _cached_asu_map(spacegroup, hmax)
+    if asu_map is None:
+        # Round up the box to improve reuse of the table
+        hmax = 4*(hmax // 4 + 1)
+        size = np.prod(2*hmax.astype(np.int64) + 1)
+        if size <= min(_asu_map_max_size, len(H)):
+            asu_map = get_asu_map(spacegroup, hmax)
+    return asu_map
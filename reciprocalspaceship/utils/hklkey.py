@@ -0,0 +1,108 @@
+import numpy as np
+
+# Each Miller index is stored in 21 bits of a signed 64-bit key, offset so
+# that the packed values are non-negative
+_hkl_key_bits = 21
+_hkl_key_offset = 2**(_hkl_key_bits - 1)
+_hkl_key_mask = 2**_hkl_key_bits - 1
+
+def hkl_to_key(H):
+    """
+    Pack Miller indices into 64-bit integer keys.
+
+    Each of H, K, and L is stored in 21 bits of the key, so Miller indices
+    must fall in the interval [-1048576, 1048575]. Keys sort in the same
+    order as Miller indices sorted lexicographically by H, K, then L, and
+    can be used for hash joins or sorting on a single integer.
+
+    Parameters
+    ----------
+    H : array
+        n x 3 array of Miller indices
+
+    Returns
+    -------
+    key : array
+        Array of int64 keys of length n
+
+    Raises
+    ------
+    ValueError
+        If a Miller index cannot be represented in 21 bits
+
+    See Also
+    --------
+    key_to_hkl : Opposite of hkl_to_key
+    """
+    H = np.asarray(H)
+    if H.ndim != 2 or H.shape[1] != 3:
+        raise ValueError(f"Expected an n x 3 array of Miller indices -- found shape {H.shape}")
+    H = H.astype(np.int64) + _hkl_key_offset
+    if len(H) and (H.min() < 0 or H.max() > _hkl_key_mask):
+        raise ValueError(f"Miller indices must be in the interval "
+                         f"[{-_hkl_key_offset}, {_hkl_key_offset - 1}]")
+    key = H[:, 0] << (2*_hkl_key_bits)
+    key |= H[:, 1] << _hkl_key_bits
+    key |= H[:, 2]
+    return key
+
+def key_to_hkl(key):
+    """
+    Unpack 64-bit integer keys into Miller indices.
+
+    Parameters
+    ----------
+    key : array
+        Array of int64 keys of length n, from ``hkl_to_key()``
+
+    Returns
+    -------
+    H : array
+        n x 3 array of int32 Miller indices
+
+    See Also
+    --------
+    hkl_to_key : Opposite of key_to_hkl
+    """
+    key = np.asarray(key, dtype=np.int64)
+    H = np.empty((len(key), 3), dtype=np.int32)
+    H[:, 0] = (key >> (2*_hkl_key_bits)) - _hkl_key_offset
+    H[:, 1] = ((key >> _hkl_key_bits) & _hkl_key_mask) - _hkl_key_offset
+    H[:, 2] = (key & _hkl_key_mask) - _hkl_key_offset
+    return H
+
+def _lookup_keys(keys, table):
+    """
+    Find the position of each key in a table of unique keys.
+
+    Parameters
+    ----------
+    keys : array
+        Array of int64 keys to look up
+    table : array
+        Array of unique int64 keys
+
+    Returns
+    -------
+    positions : array
+        Array of the same shape as `keys` with the position of each key
+        in `table`, or -1 for keys that are not in `table`
+
+    Raises
+    ------
+    ValueError
+        If `table` contains repeated keys
+    """
+    keys = np.asarray(keys)
+    table = np.asarray(table)
+    if len(table) == 0:
+        return np.full(keys.shape, -1, dtype=np.intp)
+    sorter = np.argsort(table, kind="stable")
+    sorted_table = table[sorter]
+    if (sorted_table[1:] == sorted_table[:-1]).any():
+        raise ValueError("Miller indices must not be repeated")
+    pos = np.searchsorted(sorted_table, keys).clip(max=len(table)-1)
+    found = sorted_table[pos] == keys
+    pos = sorter[pos]
+    pos[~found] = -1
+    return pos
@@ -1,5 +1,4 @@
 import numpy as np
-import gemmi
 
 def canonicalize_phases(phases, deg=True):
     """
@@ -35,26 +34,39 @@ def get_phase_restrictions(H, spacegroup):
          list is returned for Miller indices without phase restrictions
     """
     from reciprocalspaceship.utils.structurefactors import is_centric, is_absent
-    
-    restrictions = []
-    for h in H:
-        if not is_centric([h], spacegroup)[0] or is_absent([h], spacegroup)[0]:
-            restrictions.append([])
-        else:
-            friedelop = gemmi.Op("-x,-y,-z")
-            hit = False
-            for op in spacegroup.operations().sym_ops[1:]:
-                if op.apply_to_hkl(h) == friedelop.apply_to_hkl(h):
-                    shift = np.rad2deg(op.phase_shift(h))
-                    restriction = np.array([shift/2, 180+(shift/2)])
-                    restriction = canonicalize_phases(restriction)
-                    restriction.sort()
-                    restrictions.append(restriction.tolist())
-                    hit = True
-                    break
-                
-            # Handle [0, 0, 0] in P1
-            if not hit:
-                restrictions.append([])
-    return restrictions
+    from reciprocalspaceship.utils.symop import get_symop_tensors, apply_rotations
+
+    H = np.asarray(H)
+    restrictions = [[] for h in H]
+    if len(H) == 0:
+        return restrictions
+
+    # Only centric reflections that are not systematically absent have
+    # phase restrictions
+    idx = np.flatnonzero(is_centric(H, spacegroup) & ~is_absent(H, spacegroup))
+    ops = get_symop_tensors(spacegroup)
+    rot = ops.rot[1:ops.num_sym_ops]
+    tran = ops.tran[1:ops.num_sym_ops]
+    if len(idx) == 0 or len(rot) == 0:
+        # Handle [0, 0, 0] in P1
+        return restrictions
 
+    # Find the first non-identity operator that maps each Miller index onto
+    # its Friedel mate. Operators are applied one at a time to bound memory
+    # use for large n.
+    Hc = H[idx]
+    first = np.full(len(Hc), -1)
+    for i, r in enumerate(rot):
+        hc = apply_rotations(Hc, r[None], ops.den)[:, 0]
+        hit = np.all(hc == -Hc, -1) & (first < 0)
+        first[hit] = i
+    found = first >= 0
+    idx, Hc, first = idx[found], Hc[found], first[found]
+    shift = np.rad2deg(-2*np.pi*np.einsum("nj,nj->n", Hc, tran[first]) / ops.den)
+
+    restriction = np.stack([shift/2, 180+(shift/2)], axis=-1)
+    restriction = canonicalize_phases(restriction)
+    restriction.sort(axis=-1)
+    for i, r in zip(idx, restriction.tolist()):
+        restrictions[i] = r
+    return restrictions
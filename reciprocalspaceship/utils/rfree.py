@@ -23,13 +23,15 @@ def add_rfree(dataset, fraction=0.05, bins=20, inplace=False):
     result : rs.DataSet
 
     """
+    if 'dHKL' in dataset:
+        dHKL = dataset['dHKL'].to_numpy(dtype=np.float64)
+    else:
+        dHKL = dataset._get_derived("dHKL")
+
     if not inplace:
         dataset = dataset.copy()
-    dHKL_present = 'dHKL' in dataset
-    if not dHKL_present:
-        dataset = dataset.compute_dHKL(inplace=True)
 
-    bin_edges = np.percentile(dataset['dHKL'], np.linspace(100, 0, bins+1))
+    bin_edges = np.percentile(dHKL, np.linspace(100, 0, bins+1))
     bin_edges = np.vstack([bin_edges[:-1], bin_edges[1:]]).T
 
     dataset['R-free-flags'] = 0
@@ -39,10 +41,7 @@ def add_rfree(dataset, fraction=0.05, bins=20, inplace=False):
 
     for i in range(bins):
         dmax,dmin = bin_edges[i]
-        dataset[free & (dataset['dHKL'] >= dmin) & (dataset['dHKL'] <= dmax)] = i
-
-    if not dHKL_present:
-        del(dataset['dHKL'])
+        dataset.loc[free & (dHKL >= dmin) & (dHKL <= dmax), 'R-free-flags'] = i
 
     return dataset
 
@@ -63,8 +62,10 @@ def copy_rfree(dataset, dataset_with_rfree, inplace=False):
     if not inplace:
         dataset = dataset.copy()
 
-    dataset['R-free-flags'] =  0
-    dataset['R-free-flags'] = dataset['R-free-flags'].astype(MTZIntDtype())
-    idx = dataset.index.intersection(dataset_with_rfree.index)
-    dataset.loc[idx, "R-free-flags"] = dataset_with_rfree.loc[idx, "R-free-flags"]
+    from reciprocalspaceship import DataSeries
+    from reciprocalspaceship.merge import ReflectionAligner
+    aligner = ReflectionAligner(dataset, dataset_with_rfree, how="left")
+    flags = aligner.take_right(dataset_with_rfree["R-free-flags"])
+    flags = DataSeries(flags, index=dataset.index).fillna(0)
+    dataset['R-free-flags'] = flags.astype(MTZIntDtype())
     return dataset
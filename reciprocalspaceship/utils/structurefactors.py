@@ -64,31 +64,32 @@ def compute_structurefactor_multiplicity(H, sg, include_centering=True):
         an array of length n containing the multiplicity
         of each hkl.
     """
-    if isinstance(sg, SpaceGroup):
-        group_ops = sg.operations()
-    elif isinstance(sg, GroupOps):
-        group_ops = sg
-    else:
+    if not isinstance(sg, (SpaceGroup, GroupOps)):
         raise ValueError(f"gemmi.SpaceGroup or gemmi.GroupOps expected for parameter sg. "
                          f"Received object of type: ({type(sg)}) instead.")
-
-    is_centric = group_ops.is_centric()
+    ops = rs.utils.get_symop_tensors(sg)
+    is_centric = ops.centric
 
     #Lookup based on centering is equivalent to counting the number of translational
     #centering operations. Using the number of operations has proven more robust. 
     if include_centering:
         L = (1 + is_centric)
     else:
-        L = len(group_ops.cen_ops)
+        L = len(ops.cen)
         L = L*(1 + is_centric)
 
-    eps = np.zeros(len(H))
-    for op in group_ops:
-        h = rs.utils.apply_to_hkl(H, op)
+    #Centering operators repeat the rotations of the primitive operators,
+    #so every match is counted once per centering vector. Operators are
+    #applied one at a time to bound memory use for large n.
+    H = np.reshape(H, (-1, 3))
+    matches = np.zeros(len(H), dtype=int)
+    for rot in ops.rot[:ops.num_sym_ops]:
+        h = rs.utils.apply_rotations(H, rot[None], ops.den)[:, 0]
+        match = np.all(h == H, -1)
         if is_centric:
-            eps += np.all(h==H, 1) | np.all(h==-H, 1)
-        else:
-            eps += np.all(h==H, 1) 
+            match |= np.all(h == -H, -1)
+        matches += match
+    eps = len(ops.cen)*matches
     return eps/L
 
 def is_centric(H, spacegroup):
@@ -1,4 +1,6 @@
+from collections import OrderedDict
 import numpy as np
+from gemmi import SpaceGroup, GroupOps
 
 def apply_to_hkl(H, op):
     """
@@ -18,6 +20,34 @@ def apply_to_hkl(H, op):
     """
     return np.floor_divide(np.matmul(H, op.rot), op.DEN)
 
+def apply_to_hkl_batch(H, ops):
+    """
+    Apply many symmetry operators to hkls at once.
+
+    Parameters
+    ----------
+    H : array
+        n x 3 array of Miller indices
+    ops : list of gemmi.Op or gemmi.GroupOps
+        gemmi symmetry operators to be applied
+
+    Returns
+    -------
+    result : array
+        num_ops x n x 3 array of Miller indices after application of each
+        operator
+
+    See Also
+    --------
+    apply_to_hkl : Apply a single symmetry operator to hkls
+    """
+    ops = list(ops)
+    H = np.asarray(H)
+    if len(ops) == 0:
+        return np.empty((0,) + H.shape, dtype=H.dtype)
+    rot = np.array([op.rot for op in ops], dtype=H.dtype)
+    return np.floor_divide(np.matmul(H, rot), ops[0].DEN)
+
 def phase_shift(H, op):
     """
     Calculate phase shift for symmetry operator. 
@@ -35,3 +65,128 @@ def phase_shift(H, op):
         array of phase shifts
     """
     return -2*np.pi*np.matmul(H, op.tran) / op.DEN
+
+def apply_rotations(H, rot, den):
+    """
+    Apply a stack of rotation matrices to Miller indices.
+
+    Parameters
+    ----------
+    H : array
+        n x 3 array of Miller indices
+    rot : array
+        num_ops x 3 x 3 array of rotation matrices
+    den : int
+        Denominator of the rotation matrices
+
+    Returns
+    -------
+    result : array
+        n x num_ops x 3 array of Miller indices after each rotation
+    """
+    return np.floor_divide(np.tensordot(H, rot, axes=(1, 1)), den)
+
+class SymOpTensors:
+    """
+    Symmetry operators of a space group stored as stacked NumPy arrays.
+
+    Operators are ordered as in iteration over ``gemmi.GroupOps``: the
+    first ``num_sym_ops`` entries are the primitive symmetry operators,
+    followed by the same operators combined with each additional
+    centering vector. All arrays are read-only because instances are
+    shared through the cache used by :func:`get_symop_tensors`.
+
+    Attributes
+    ----------
+    rot : np.ndarray
+        num_ops x 3 x 3 array of rotation matrices (scaled by `den`)
+    tran : np.ndarray
+        num_ops x 3 array of translation vectors (scaled by `den`)
+    inv_rot : np.ndarray
+        num_ops x 3 x 3 array of rotation matrices of the inverse operators
+    inv_tran : np.ndarray
+        num_ops x 3 array of translation vectors of the inverse operators
+    cen : np.ndarray
+        num_cen x 3 array of centering vectors (scaled by `den`)
+    den : int
+        Common denominator of the rotation and translation components
+    num_sym_ops : int
+        Number of symmetry operators without centering
+    centric : bool
+        Whether the space group is centrosymmetric
+    asu_case : int or None
+        Index of the reciprocal space ASU definition for the space group.
+        None if the operators were not provided as a gemmi.SpaceGroup
+    basis_rot : np.ndarray or None
+        3 x 3 rotation matrix of the change-of-basis operator to the
+        reference setting. None if the operators were not provided as a
+        gemmi.SpaceGroup
+    basis_den : int or None
+        Denominator of `basis_rot`
+    """
+    def __init__(self, group_ops, spacegroup=None):
+        ops = list(group_ops)
+        inverse = [op.inverse() for op in ops]
+        self.rot = _readonly(np.array([op.rot for op in ops], dtype=np.int32))
+        self.tran = _readonly(np.array([op.tran for op in ops], dtype=np.int32))
+        self.inv_rot = _readonly(np.array([op.rot for op in inverse], dtype=np.int32))
+        self.inv_tran = _readonly(np.array([op.tran for op in inverse], dtype=np.int32))
+        self.cen = _readonly(np.array(group_ops.cen_ops, dtype=np.int32).reshape(-1, 3))
+        self.den = ops[0].DEN
+        self.num_sym_ops = len(group_ops.sym_ops)
+        self.centric = group_ops.is_centric()
+
+        self.asu_case = None
+        self.basis_rot = None
+        self.basis_den = None
+        if spacegroup is not None:
+            from reciprocalspaceship.utils.asu import ccp4_hkl_asu
+            basis_op = spacegroup.basisop
+            self.asu_case = ccp4_hkl_asu[spacegroup.number-1]
+            self.basis_rot = _readonly(np.array(basis_op.rot, dtype=np.int32))
+            self.basis_den = basis_op.DEN
+
+    def __len__(self):
+        return len(self.rot)
+
+def _readonly(array):
+    array.setflags(write=False)
+    return array
+
+# Most recently used SymOpTensors, keyed by Hall symbol
+_symop_cache = OrderedDict()
+_symop_cache_size = 32
+
+def get_symop_tensors(spacegroup):
+    """
+    Get the symmetry operators of a space group as stacked NumPy arrays.
+
+    Results for ``gemmi.SpaceGroup`` objects are cached by Hall symbol,
+    keeping the most recently used space groups. ``gemmi.GroupOps`` are
+    converted on every call.
+
+    Parameters
+    ----------
+    spacegroup : gemmi.SpaceGroup, gemmi.GroupOps
+        Space group or group of symmetry operators
+
+    Returns
+    -------
+    SymOpTensors
+    """
+    if isinstance(spacegroup, GroupOps):
+        return SymOpTensors(spacegroup)
+    elif not isinstance(spacegroup, SpaceGroup):
+        raise ValueError(f"gemmi.SpaceGroup or gemmi.GroupOps expected for parameter spacegroup. "
+                         f"Received object of type: ({type(spacegroup)}) instead.")
+
+    key = spacegroup.hall
+    try:
+        tensors = _symop_cache[key]
+        _symop_cache.move_to_end(key)
+    except KeyError:
+        tensors = SymOpTensors(spacegroup.operations(), spacegroup)
+        _symop_cache[key] = tensors
+        if len(_symop_cache) > _symop_cache_size:
+            _symop_cache.popitem(last=False)
+    return tensors
@@ -1,5 +1,6 @@
 import pytest
 import numpy as np
+import pandas as pd
 import reciprocalspaceship as rs
 from pandas.testing import assert_series_equal
 
@@ -49,3 +50,243 @@ def test_to_numpy_nan(data_int, with_nan):
         assert result.dtype.name == "object"
     else:
         assert result.dtype.name == "int32"
+
+@pytest.mark.parametrize("other", [
+    0.1, 3, np.float64(0.3), np.float32(0.3), True,
+    np.linspace(-2, 2, 100), np.arange(-50, 50), list(np.linspace(-2, 2, 100)),
+])
+def test_arithmetic_matches_scalars(data_float, all_arithmetic_operators, other):
+    """
+    Test NumpyExtensionArray arithmetic matches element-wise operations on
+    NumPy scalars and preserves the array type
+    """
+    data_float = data_float - 10.
+    op = getattr(data_float, all_arithmetic_operators)
+    values = other if np.ndim(other) else [other]*len(data_float)
+    with np.errstate(all="ignore"):
+        result = op(other)
+        expected = [ getattr(a, all_arithmetic_operators)(b) for a, b in
+                     zip(data_float.data, values) ]
+    expected = np.array(expected, dtype=np.float32)
+
+    assert type(result) is type(data_float)
+    assert np.array_equal(result.data, expected, equal_nan=True)
+
+def test_comparison_matches_scalars(data_float, all_compare_operators):
+    """Test NumpyExtensionArray comparisons return boolean ndarray"""
+    data_float[5] = np.nan
+    for other in [50.1, np.linspace(0, 100, 100), data_float[::-1]]:
+        result = getattr(data_float, all_compare_operators)(other)
+        values = other if np.ndim(other) else [other]*len(data_float)
+        expected = [ getattr(a, all_compare_operators)(b) for a, b in
+                     zip(data_float.data, values) ]
+        assert isinstance(result, np.ndarray)
+        assert result.dtype == bool
+        assert np.array_equal(result, expected)
+
+def test_arithmetic_masked_operand(data_float, data_int):
+    """Test NumpyExtensionArray arithmetic with missing integer values"""
+    data_int[10] = data_int._na_value
+    result = data_float * data_int
+    expected = data_float.data * data_int.to_numpy(dtype=np.float32, na_value=np.nan)
+
+    assert type(result) is type(data_float)
+    assert np.array_equal(result.data, expected, equal_nan=True)
+
+def test_arithmetic_length_mismatch(data_float):
+    """Test NumpyExtensionArray arithmetic raises ValueError for mismatched lengths"""
+    with pytest.raises(ValueError):
+        data_float + np.arange(10)
+
+@pytest.mark.parametrize("op", ["__add__", "__mul__", "__lt__", "__eq__"])
+def test_ops_defer_to_dataframe(data_float, op):
+    """Test NumpyExtensionArray operators return NotImplemented for DataFrames"""
+    df = pd.DataFrame({"A": data_float})
+    assert getattr(data_float, op)(df) is NotImplemented
+
+def test_divmod(data_float):
+    """Test divmod() with NumpyExtensionArray"""
+    div, mod = divmod(data_float, 7.)
+    assert type(div) is type(data_float)
+    assert type(mod) is type(data_float)
+    assert np.array_equal(div.data, data_float.data // np.float32(7.))
+    assert np.array_equal(mod.data, data_float.data % np.float32(7.))
+
+@pytest.mark.parametrize("ufunc", [np.abs, np.negative, np.floor])
+def test_ufunc_float(data_float, ufunc):
+    """Test NumPy ufuncs that keep units preserve float32 MTZ dtypes"""
+    with np.errstate(all="ignore"):
+        result = ufunc(data_float)
+        expected = ufunc(data_float.data)
+    assert type(result) is type(data_float)
+    assert np.array_equal(result.data, expected, equal_nan=True)
+
+    series = rs.DataSeries(data_float, name="F")
+    with np.errstate(all="ignore"):
+        result = ufunc(series)
+    assert result.dtype == data_float.dtype
+    assert result.name == "F"
+
+@pytest.mark.parametrize("ufunc", [np.sqrt, np.exp, np.log, np.cos, np.deg2rad])
+def test_ufunc_float_ndarray(data_float, ufunc):
+    """Test NumPy ufuncs that change units return float32 ndarrays"""
+    with np.errstate(all="ignore"):
+        result = ufunc(data_float)
+        expected = ufunc(data_float.data)
+    assert isinstance(result, np.ndarray)
+    assert result.dtype == np.float32
+    assert np.array_equal(result, expected, equal_nan=True)
+
+    series = rs.DataSeries(data_float, name="F")
+    with np.errstate(all="ignore"):
+        result = ufunc(series)
+    assert result.dtype == np.float32
+    assert result.name == "F"
+
+def test_ufunc_float_complex():
+    """Test complex results of NumPy ufuncs and arithmetic are not cast to float32"""
+    F = rs.DataSeries(np.linspace(1., 10., 10), dtype="SFAmplitude")
+    phi = rs.DataSeries(np.linspace(-180., 180., 10), dtype="Phase")
+    expected = rs.utils.to_structurefactor(F, phi)
+
+    for result in [F*np.exp(1j*np.deg2rad(phi)),
+                   np.multiply(F, np.exp(1j*np.deg2rad(phi.to_numpy())))]:
+        assert result.dtype.kind == "c"
+        assert np.allclose(result, expected)
+
+    result = F.array * 1j
+    assert isinstance(result, np.ndarray)
+    assert np.array_equal(result, F.to_numpy() * 1j)
+
+def test_ufunc_float_bool(data_float):
+    """Test NumPy ufuncs with boolean results return ndarray"""
+    data_float[5] = np.nan
+    result = np.isnan(data_float)
+    assert isinstance(result, np.ndarray)
+    assert np.array_equal(result, np.isnan(data_float.data))
+
+def test_ufunc_float_out(data_float):
+    """Test NumPy ufuncs update NumpyExtensionArray in place with out="""
+    expected = np.sqrt(data_float.data)
+    data = data_float.data
+    result = np.sqrt(data_float, out=data_float)
+    assert result is data_float
+    assert data_float.data is data
+    assert np.array_equal(data_float.data, expected)
+
+def test_ufunc_float_out_masked(data_float, data_int):
+    """Test NumPy ufuncs raise TypeError for out= masked integer arrays"""
+    expected = data_int.copy()
+    with pytest.raises(TypeError):
+        np.sqrt(data_float, out=data_int)
+    assert data_int.equals(expected)
+
+def test_unary_float(data_float):
+    """Test unary operators on DataSeries preserve float32 MTZ dtypes"""
+    series = rs.DataSeries(data_float) - 50.
+    for result, expected in [(-series, -series.array.data),
+                             (abs(series), np.abs(series.array.data)),
+                             (+series, series.array.data)]:
+        assert result.dtype == series.dtype
+        assert np.array_equal(result.array.data, expected)
+
+@pytest.mark.parametrize("ufunc", [np.abs, np.negative, np.square])
+def test_ufunc_int(data_int, ufunc):
+    """Test NumPy ufuncs preserve int32 MTZ dtypes and missing values"""
+    data_int[10] = data_int._na_value
+    result = ufunc(data_int)
+    assert result.dtype == data_int.dtype
+    assert np.array_equal(result._mask, data_int._mask)
+    assert np.array_equal(result._data[~result._mask], ufunc(data_int._data[~data_int._mask]))
+
+    result = np.sqrt(data_int)
+    assert isinstance(result, np.ndarray)
+    assert np.isnan(result[10])
+
+    np.negative(data_int, out=data_int)
+    assert data_int._mask[10]
+    assert data_int[11] == -11
+
+def test_values_for_factorize(data_float):
+    """Test NumpyExtensionArray._values_for_factorize() does not copy data"""
+    values, na_value = data_float._values_for_factorize()
+    assert values is data_float.data
+    assert np.isnan(na_value)
+
+def test_unique_order(data_float):
+    """Test NumpyExtensionArray.unique() returns values in order of appearance"""
+    data = data_float._from_sequence([3., np.nan, 1., 3., np.nan, 2.], dtype=data_float.dtype)
+    result = data.unique()
+    assert type(result) is type(data_float)
+    assert np.array_equal(result.data, [3., np.nan, 1., 2.], equal_nan=True)
+
+@pytest.mark.parametrize("reduction,kwargs", [
+    ("std", {"ddof": 0}), ("var", {"ddof": 0}), ("sum", {"min_count": 200}),
+    ("prod", {"min_count": 200}), ("mean", {}),
+])
+def test_reduce_kwargs(data_float, reduction, kwargs):
+    """Test DataSeries reductions pass keyword arguments to nanops"""
+    series = rs.DataSeries(data_float)
+    expected = getattr(pd.Series(data_float.data), reduction)(**kwargs)
+    result = getattr(series, reduction)(**kwargs)
+    assert np.isclose(result, expected, equal_nan=True)
+
+def test_groupby_float_key(data_float):
+    """Test groupby() keyed on a float32 MTZ dtype matches float32 data"""
+    data = data_float._from_sequence(np.arange(100) % 7, dtype=data_float.dtype)
+    ds = rs.DataSet({"key": data, "value": np.arange(100.)})
+    expected = pd.DataFrame({"key": data.data, "value": np.arange(100.)})
+    result = ds.groupby("key")["value"].agg(["mean", "sum", "count"])
+    expected = expected.groupby("key")["value"].agg(["mean", "sum", "count"])
+    assert np.array_equal(result.index.to_numpy(dtype=np.float32), expected.index.to_numpy())
+    assert np.array_equal(result.to_numpy(), expected.to_numpy())
+
+def test_nbytes(data_all):
+    """Test nbytes reports the size of the backing arrays"""
+    assert data_all.nbytes == 4*len(data_all)
+    assert rs.DataSeries(data_all).memory_usage(index=False) == data_all.nbytes
+
+def test_nbytes_missing(data_int):
+    """Test nbytes includes the mask of int32-backed arrays with missing values"""
+    data_int[10] = data_int._na_value
+    assert data_int.nbytes == 5*len(data_int)
+
+def test_compact_mask(data_int):
+    """Test int32-backed arrays without missing values do not store a mask"""
+    assert data_int._mask.strides == (0,)
+    assert not data_int._hasna
+    assert np.shares_memory(data_int.to_numpy(), data_int._data)
+
+    # Masks returned by isna() are writeable and not shared
+    isna = data_int.isna()
+    isna[0] = True
+    assert not data_int.isna().any()
+
+    # Setting values allocates a mask
+    data_int[10] = data_int._na_value
+    assert data_int._hasna
+    assert data_int.isna().sum() == 1
+    data_int[10] = 10
+    assert not data_int._hasna
+    assert data_int[10] == 10
+
+    # Masks of new arrays are compacted
+    assert data_int[5:20]._mask.strides == (0,)
+    assert data_int.take([1, 2, 3])._mask.strides == (0,)
+    assert data_int.take([1, -1], allow_fill=True)._hasna
+
+def test_factorize_missing(data_int):
+    """Test factorize() of int32-backed arrays matches pd.Int32Dtype"""
+    data_int[[3, 10, 11]] = data_int._na_value
+    data_int[20:30] = 5
+    expected_codes, expected_uniques = pd.array(data_int, dtype="Int32").factorize()
+    codes, uniques = data_int.factorize()
+    assert np.array_equal(codes, expected_codes)
+    assert uniques.dtype == data_int.dtype
+    assert np.array_equal(uniques.to_numpy(dtype=np.int32),
+                          expected_uniques.to_numpy(dtype=np.int32))
+
+    # Masks of factorized arrays need not be writeable
+    data_int._mask.flags.writeable = False
+    codes, _ = data_int.factorize()
+    assert np.array_equal(codes, expected_codes)
@@ -124,9 +124,180 @@ def test_roundtrip(data_unmerged, label_centrics):
     data2.write_mtz(temp2.name)
 
     assert filecmp.cmp(temp.name, temp2.name)
-    assert_frame_equal(data_unmerged, data2)
+
+    # Writing does not modify the DataSet. PARTIAL is read back as the
+    # last column, so column order is not preserved
+    assert "PARTIAL" in data_unmerged.columns
+    assert_frame_equal(data_unmerged, data2, check_like=True)
     assert data_unmerged.merged == data2.merged
 
     # Clean up
     temp.close()
     temp2.close()
+
+
+@pytest.mark.parametrize("columns", ["I", ["SIGI", "I"], ["BATCH", "I", "SIGI"]])
+def test_read_mtz_columns(data_unmerged, columns):
+    """Test rs.read_mtz() with a subset of columns"""
+    datadir = join(abspath(dirname(__file__)), '../data/algorithms')
+    result = rs.read_mtz(join(datadir, 'HEWL_unmerged.mtz'), columns=columns)
+
+    if isinstance(columns, str):
+        columns = [columns]
+    expected = [ c for c in data_unmerged.columns if c in columns or c == "PARTIAL" ]
+    assert list(result.columns) == expected
+    assert not result.merged
+    assert_frame_equal(result, data_unmerged[expected])
+
+
+def test_read_mtz_columns_missing():
+    """Test rs.read_mtz() raises ValueError for missing columns"""
+    datadir = join(abspath(dirname(__file__)), '../data/fmodel')
+    with pytest.raises(ValueError):
+        rs.read_mtz(join(datadir, '9LYZ.mtz'), columns=["FMODEL", "SIGFMODEL"])
+
+
+def test_from_gemmi_missing_integers():
+    """Test rs.io.from_gemmi() preserves missing values in integer columns"""
+    datadir = join(abspath(dirname(__file__)), '../data/algorithms')
+    mtz = gemmi.read_mtz_file(join(datadir, 'HEWL_unmerged.mtz'))
+    data = np.array(mtz, copy=True)
+    batch = mtz.column_labels().index("BATCH")
+    data[::3, batch] = np.nan
+    mtz.set_data(data)
+
+    result = rs.io.from_gemmi(mtz)
+    assert result["BATCH"].dtype.name == "Batch"
+    assert result["BATCH"].isna().sum() == len(data[::3])
+    assert (result["BATCH"].dropna().to_numpy() == data[~np.isnan(data[:, batch]), batch]).all()
+
+
+@pytest.mark.parametrize("chunksize", [1000, 7777, 10**6])
+def test_read_mtz_chunks(mtz_by_spacegroup, chunksize):
+    """Test rs.io.read_mtz_chunks() matches rs.read_mtz()"""
+    expected = rs.read_mtz(mtz_by_spacegroup)
+    chunks = list(rs.io.read_mtz_chunks(mtz_by_spacegroup, chunksize=chunksize))
+
+    assert len(chunks) == -(-len(expected) // chunksize)
+    for chunk in chunks:
+        assert chunk.merged == expected.merged
+        assert chunk.spacegroup.xhm() == expected.spacegroup.xhm()
+        assert chunk.cell.parameters == pytest.approx(expected.cell.parameters)
+    result = rs.concat(chunks)
+    assert_frame_equal(result, expected, check_index_type=False)
+
+
+@pytest.mark.parametrize("columns", [None, ["I", "SIGI"]])
+def test_read_mtz_chunks_unmerged(data_unmerged, columns):
+    """Test rs.io.read_mtz_chunks() with unmerged data"""
+    datadir = join(abspath(dirname(__file__)), '../data/algorithms')
+    chunks = rs.io.read_mtz_chunks(join(datadir, 'HEWL_unmerged.mtz'),
+                                   chunksize=5000, columns=columns)
+    result = rs.concat(list(chunks))
+
+    if columns is not None:
+        data_unmerged = data_unmerged[columns + ["PARTIAL"]]
+    assert not result.merged
+    assert_frame_equal(result, data_unmerged, check_index_type=False)
+
+
+def test_read_mtz_chunks_merged_m_isym(data_merged):
+    """Test rs.io.read_mtz_chunks() infers merged status as rs.read_mtz()"""
+    temp = tempfile.NamedTemporaryFile(suffix=".mtz")
+    data_merged["M/ISYM"] = rs.DataSeries(np.ones(len(data_merged)), dtype="M/ISYM",
+                                          index=data_merged.index)
+    data_merged.write_mtz(temp.name)
+
+    expected = rs.read_mtz(temp.name)
+    chunks = list(rs.io.read_mtz_chunks(temp.name, chunksize=5000))
+    assert expected.merged
+    for chunk in chunks:
+        assert chunk.merged == expected.merged
+    assert_frame_equal(rs.concat(chunks), expected, check_index_type=False)
+
+    # Clean up
+    temp.close()
+
+
+@pytest.mark.parametrize("chunksize", [0, -1])
+def test_read_mtz_chunks_invalid_chunksize(chunksize):
+    """Test rs.io.read_mtz_chunks() raises ValueError for invalid chunksize"""
+    datadir = join(abspath(dirname(__file__)), '../data/fmodel')
+    with pytest.raises(ValueError):
+        next(rs.io.read_mtz_chunks(join(datadir, '9LYZ.mtz'), chunksize=chunksize))
+
+
+def test_mtzwriter(mtz_by_spacegroup):
+    """Test rs.io.MTZWriter writes the same file as DataSet.write_mtz()"""
+    dataset = rs.read_mtz(mtz_by_spacegroup)
+    temp  = tempfile.NamedTemporaryFile(suffix=".mtz")
+    temp2 = tempfile.NamedTemporaryFile(suffix=".mtz")
+    with rs.io.MTZWriter(temp.name) as writer:
+        for i in range(0, len(dataset), 5000):
+            writer.write(dataset.iloc[i:i+5000])
+    assert writer.nreflections == len(dataset)
+    assert writer.closed
+
+    dataset.write_mtz(temp2.name)
+    assert filecmp.cmp(temp.name, temp2.name, shallow=False)
+
+    # Clean up
+    temp.close()
+    temp2.close()
+
+
+def test_mtzwriter_mismatched_columns(data_merged):
+    """Test rs.io.MTZWriter raises ValueError if chunk columns differ"""
+    temp = tempfile.NamedTemporaryFile(suffix=".mtz")
+    with pytest.raises(ValueError):
+        with rs.io.MTZWriter(temp.name) as writer:
+            writer.write(data_merged.iloc[:100])
+            writer.write(data_merged.iloc[100:, :-1])
+    assert writer.closed
+
+    # Clean up
+    temp.close()
+
+
+@pytest.mark.parametrize("columns", [None, "FMODEL"])
+def test_read_mtz_mmap(mtz_by_spacegroup, columns):
+    """Test rs.read_mtz(mmap=True) matches rs.read_mtz()"""
+    expected = rs.read_mtz(mtz_by_spacegroup, columns=columns)
+    result = rs.read_mtz(mtz_by_spacegroup, columns=columns, mmap=True)
+    assert_frame_equal(result, expected)
+    assert result.merged == expected.merged
+    assert result.spacegroup.xhm() == expected.spacegroup.xhm()
+
+
+def test_read_mtz_mmap_unmerged(data_unmerged):
+    """Test rs.read_mtz(mmap=True) with unmerged data"""
+    datadir = join(abspath(dirname(__file__)), '../data/algorithms')
+    result = rs.read_mtz(join(datadir, 'HEWL_unmerged.mtz'), mmap=True)
+    assert not result.merged
+    assert_frame_equal(result, data_unmerged)
+
+
+def test_read_mtz_mmap_copy_on_write(data_merged):
+    """Test modifying a memory-mapped DataSet does not change the file"""
+    temp = tempfile.NamedTemporaryFile(suffix=".mtz")
+    data_merged.write_mtz(temp.name)
+
+    result = rs.read_mtz(temp.name, mmap=True)
+    label = "IMEAN"
+    result[label].array.data[:] = 0.
+    assert (result[label] == 0.).all()
+    assert_frame_equal(rs.read_mtz(temp.name), data_merged)
+
+    # Clean up
+    temp.close()
+
+
+def test_write_mtz_unmodified(data_hewl):
+    """Test DataSet.write_mtz() does not modify the DataSet"""
+    expected = data_hewl.copy()
+    temp = tempfile.NamedTemporaryFile(suffix=".mtz")
+    data_hewl.write_mtz(temp.name)
+    assert_frame_equal(data_hewl, expected)
+
+    # Clean up
+    temp.close()
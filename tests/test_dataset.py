@@ -1,7 +1,9 @@
 import pytest
+import pickle
 import numpy as np
 import reciprocalspaceship as rs
 import gemmi
+from os.path import join, abspath, dirname
 from pandas.testing import assert_frame_equal
 
 
@@ -114,6 +116,18 @@ def test_get_hkls(data_fmodel):
     assert np.array_equal(result, expected)
 
 
+@pytest.mark.parametrize("index", [None, "H", ["K", "L"], ["L", "H", "K"]])
+def test_get_hkls_index(data_fmodel, index):
+    """Test DataSet.get_hkls() with Miller indices in columns and index"""
+    expected = data_fmodel.get_hkls()
+    data_fmodel.reset_index(inplace=True)
+    if index is not None:
+        data_fmodel.set_index(index, inplace=True)
+    result = data_fmodel.get_hkls()
+    assert result.dtype == np.int32
+    assert np.array_equal(result, expected)
+
+
 @pytest.mark.parametrize("inplace", [True, False])
 @pytest.mark.parametrize("no_sg", [True, False])
 def test_label_centrics(data_fmodel, inplace, no_sg):
@@ -402,6 +416,147 @@ def test_apply_symop_roundtrip(mtz_by_spacegroup):
         assert np.isclose(original, back, rtol=1e-3).all()
 
 
+def test_memory_report(data_merged):
+    """Test DataSet.memory_report() breaks down memory usage"""
+    report = data_merged.memory_report()
+    assert list(report.index.names) == ["category", "name"]
+    assert report.loc["columns"].to_dict() == data_merged.memory_usage(index=False).to_dict()
+    assert list(report.loc["index"].index) == ["H", "K", "L"]
+    for level, codes in zip(data_merged.index.levels, data_merged.index.codes):
+        assert report.loc[("index", level.name)] == level.nbytes + codes.nbytes
+    assert "cache" not in report.index.get_level_values("category")
+
+    dHKL = data_merged._get_derived("dHKL")
+    report = data_merged.memory_report()
+    assert report.loc[("cache", "dHKL")] == dHKL.nbytes
+
+    report = data_merged.reset_index().memory_report()
+    assert report.loc["index"].index.tolist() == ["Index"]
+
+
+def test_apply_symop_matches_reference(mtz_by_spacegroup):
+    """
+    Test DataSet.apply_symop() against applying each symmetry operation
+    to the Miller indices and phases of a DataSet directly
+    """
+    dataset = rs.read_mtz(mtz_by_spacegroup)
+    dataset["PHI2"] = dataset["PHIFMODEL"] / 2.
+    H = dataset.get_hkls()
+    for op in dataset.spacegroup.operations():
+        result = dataset.apply_symop(op)
+
+        expected = dataset.copy()
+        expected.reset_index(inplace=True)
+        expected[["H", "K", "L"]] = rs.utils.apply_to_hkl(H, op)
+        expected.set_index(["H", "K", "L"], inplace=True)
+        shifts = np.rad2deg(rs.utils.phase_shift(H, op))
+        for key in ["PHIFMODEL", "PHI2"]:
+            expected[key] = rs.utils.canonicalize_phases(expected[key] + shifts)
+
+        assert_frame_equal(result, expected)
+        assert list(result.index.names) == ["H", "K", "L"]
+        assert result.index.levels[0].is_monotonic_increasing
+
+
+@pytest.mark.parametrize("op", ["-x/2,y,z", "-x/3,y,z", "x/2,-y,z", "y,x,-z"])
+def test_apply_symop_fractional(data_fmodel, op):
+    """Test DataSet.apply_symop() matches apply_to_hkl() for fractional operators"""
+    op = gemmi.Op(op)
+    expected = rs.utils.apply_to_hkl(data_fmodel.get_hkls(), op)
+    result = data_fmodel.apply_symop(op)
+    assert np.array_equal(result.get_hkls(), expected)
+
+
+@pytest.mark.parametrize("column", ["FMODEL", "PHIFMODEL"])
+def test_apply_symops(mtz_by_spacegroup, column):
+    """
+    Test DataSet.apply_symops() against DataSet.apply_symop() followed by
+    a join with the reference
+    """
+    dataset = rs.read_mtz(mtz_by_spacegroup)
+    reference = dataset.sample(frac=0.8, random_state=0)
+    reference[column] = reference[column].astype(np.float64)
+    ops = list(dataset.spacegroup.operations())
+    result = dataset.apply_symops(ops, reference, column)
+
+    assert result.shape == (len(ops), len(reference))
+    for i, op in enumerate(ops):
+        applied = dataset.apply_symop(op)[[column]]
+        expected = reference[[]].join(applied)[column].astype(np.float64).to_numpy()
+        assert np.array_equal(result[i], expected, equal_nan=True)
+
+
+@pytest.mark.parametrize("column", ["FMODEL", "PHIFMODEL"])
+def test_apply_symops_asu(mtz_by_spacegroup, column):
+    """
+    Test DataSet.apply_symops(asu=True) against DataSet.apply_symop()
+    followed by DataSet.hkl_to_asu() and a join with the reference
+    """
+    dataset = rs.read_mtz(mtz_by_spacegroup).hkl_to_asu()
+    reference = dataset.sample(frac=0.8, random_state=0)
+    ops = list(dataset.spacegroup.operations())
+    result = dataset.apply_symops(ops, reference, column, asu=True)
+
+    for i, op in enumerate(ops):
+        applied = dataset.apply_symop(op).hkl_to_asu()[[column]]
+        expected = reference[[]].join(applied)[column].astype(np.float64).to_numpy()
+        assert np.array_equal(result[i], expected, equal_nan=True)
+        assert not np.isnan(result[i]).any()
+
+
+def test_apply_symops_reindex():
+    """Test DataSet.apply_symops(asu=True) identifies a reindexing operation"""
+    datadir = join(abspath(dirname(__file__)), "data/fmodel")
+    reference = rs.read_mtz(join(datadir, "6E6T.mtz")).hkl_to_asu()
+    reindexed = reference.apply_symop("y,x,-z").hkl_to_asu()
+    ops = ["x,y,z", "y,x,-z"]
+
+    # Without asu=True, most reindexed reflections are outside the ASU
+    result = reindexed.apply_symops(ops, reference, "FMODEL")
+    assert np.isnan(result[1]).sum() > len(reference) / 2
+    result = reindexed.apply_symops(ops, reference, "FMODEL", asu=True)
+    assert not np.isnan(result).any()
+
+    result = reindexed.apply_symops(ops, reference, "FMODEL", correlate=True, asu=True)
+    assert np.isclose(result[1], 1.)
+    assert result[0] < 0.9
+
+    # Symmetry-equivalent Miller indices map to the same ASU reflection
+    H = reference.get_hkls()
+    general = reference.loc[(H[:, 0] != 0) | (H[:, 1] != 0)]
+    equivalent = rs.concat([general, general.apply_symop("-x,-y,z")])
+    equivalent.apply_symops(ops, reference, "FMODEL")
+    with pytest.raises(ValueError):
+        equivalent.apply_symops(ops, reference, "FMODEL", asu=True)
+
+def test_apply_symops_correlate(mtz_by_spacegroup):
+    """Test DataSet.apply_symops() with correlate=True"""
+    dataset = rs.read_mtz(mtz_by_spacegroup)
+    reference = dataset.sample(frac=0.8, random_state=0)
+    reference["F"] = reference["FMODEL"].to_numpy() + np.random.rand(len(reference))
+    ops = ["x,y,z", "-x,-y,-z", "y,x,z"]
+    result = dataset.apply_symops(ops, reference, "FMODEL", "F", correlate=True)
+
+    aligned = dataset.apply_symops(ops, reference, "FMODEL")
+    y = reference["F"].to_numpy()
+    for i in range(len(ops)):
+        valid = ~np.isnan(aligned[i])
+        if valid.sum() < 2:
+            assert np.isnan(result[i])
+        else:
+            expected = np.corrcoef(aligned[i][valid], y[valid])[0, 1]
+            assert np.isclose(result[i], expected)
+    assert result[0] > 0.9
+
+
+def test_apply_symops_repeated(data_unmerged):
+    """Test DataSet.apply_symops() raises ValueError with repeated HKLs"""
+    with pytest.raises(ValueError):
+        data_unmerged.apply_symops(["x,y,z"], data_unmerged, "I")
+    with pytest.raises(ValueError):
+        data_unmerged.apply_symops(["x,y,z"], data_unmerged.iloc[:0], "I")
+
+
 @pytest.mark.parametrize("inplace", [True, False])
 def test_canonicalize_phases(data_fmodel, inplace):
     """Test DataSet.canonicalize_phases()"""
@@ -450,3 +605,165 @@ def test_is_isomorphous(data_unmerged, data_fmodel, sg1, sg2, cell1, cell2):
             assert result
         else:
             assert not result
+
+
+@pytest.mark.parametrize("name", ["dHKL", "centric", "absent", "epsilon", "asu"])
+def test_get_derived_cache(data_fmodel, name):
+    """Test DataSet._get_derived() caches results until HKLs, cell, or spacegroup change"""
+    result = data_fmodel._get_derived(name)
+    assert data_fmodel._get_derived(name) is result
+
+    # Cached values are read-only and are not shared with copies
+    for array in (result if isinstance(result, tuple) else (result,)):
+        assert not array.flags.writeable
+    assert data_fmodel.copy()._get_derived(name) is not result
+
+    data_fmodel.cell = gemmi.UnitCell(*data_fmodel.cell.parameters)
+    assert data_fmodel._get_derived(name) is result
+    data_fmodel.cell = gemmi.UnitCell(100., 100., 100., 90., 90., 90.)
+    assert data_fmodel._get_derived(name) is not result
+
+    result = data_fmodel._get_derived(name)
+    data_fmodel.spacegroup = gemmi.SpaceGroup(19)
+    assert data_fmodel._get_derived(name) is not result
+
+    result = data_fmodel._get_derived(name)
+    data_fmodel.apply_symop("-x,-y,-z", inplace=True)
+    assert data_fmodel._get_derived(name) is not result
+
+
+def test_get_derived_columns(data_fmodel):
+    """Test DataSet._get_derived() recomputes when HKLs are stored in columns"""
+    data_fmodel.reset_index(inplace=True)
+    result = data_fmodel._get_derived("dHKL")
+    assert data_fmodel._get_derived("dHKL") is not result
+
+    data_fmodel["H"] = data_fmodel["H"] + 1
+    expected = rs.utils.compute_dHKL(data_fmodel.get_hkls(), data_fmodel.cell)
+    assert np.array_equal(data_fmodel._get_derived("dHKL"), expected)
+
+
+@pytest.mark.parametrize("method", ["compute_dHKL", "label_centrics", "hkl_to_asu",
+                                    "compute_multiplicity", "memory_report"])
+def test_get_derived_pickle(data_fmodel, method):
+    """Test DataSet methods using cached derived properties after pickling"""
+    data_fmodel.compute_dHKL(inplace=True)
+    expected = getattr(data_fmodel, method)()
+    unpickled = pickle.loads(pickle.dumps(data_fmodel))
+    result = getattr(unpickled, method)()
+    if method == "memory_report":
+        assert "cache" not in result.index.get_level_values("category")
+    else:
+        assert_frame_equal(result, expected)
+
+@pytest.mark.parametrize("method,args", [
+    ("label_centrics", ()),
+    ("label_absences", ()),
+    ("compute_dHKL", ()),
+    ("compute_multiplicity", ()),
+    ("assign_resolution_bins", ()),
+    ("canonicalize_phases", ()),
+    ("apply_symop", ("-y+1/2,x+1/2,z+3/4",)),
+    ("hkl_to_asu", ()),
+    ("hkl_to_key", ()),
+])
+def test_copy_on_write(data_fmodel, method, args):
+    """
+    Test inplace=False methods called on the result of an inplace=False
+    method share untouched columns and do not modify DataSet
+    """
+    data_fmodel = data_fmodel.label_centrics()
+    data_fmodel["CENTRIC"] = ~data_fmodel["CENTRIC"]
+    data_fmodel["EXTRA"] = np.arange(len(data_fmodel), dtype=np.float64)
+    expected = data_fmodel.copy(deep=True)
+
+    result = getattr(data_fmodel, method)(*args)
+    if isinstance(result, tuple):
+        result = result[0]
+    assert_frame_equal(data_fmodel, expected)
+
+    if method in ["canonicalize_phases", "apply_symop", "hkl_to_asu"]:
+        assert not np.shares_memory(result["PHIFMODEL"].array.data,
+                                    data_fmodel["PHIFMODEL"].array.data)
+    else:
+        assert np.shares_memory(result["FMODEL"].array.data,
+                                data_fmodel["FMODEL"].array.data)
+
+
+@pytest.mark.parametrize("method", ["label_centrics", "compute_dHKL", "hkl_to_key"])
+def test_copy_on_write_read_mtz(data_fmodel, method):
+    """
+    Test the first inplace=False method on a DataSet from rs.read_mtz()
+    copies its columns, and chained methods share them
+    """
+    result = getattr(data_fmodel, method)()
+    assert data_fmodel["FMODEL"].array.data.flags.writeable
+    assert not result["FMODEL"].array.data.flags.writeable
+    assert not np.shares_memory(result["FMODEL"].array.data,
+                                data_fmodel["FMODEL"].array.data)
+
+    chained = result.compute_dHKL()
+    assert np.shares_memory(chained["FMODEL"].array.data,
+                            result["FMODEL"].array.data)
+
+
+@pytest.mark.parametrize("method,args", [
+    ("label_centrics", ()),
+    ("compute_dHKL", ()),
+    ("apply_symop", ("-y+1/2,x+1/2,z+3/4",)),
+    ("hkl_to_key", ()),
+])
+def test_copy_on_write_source_writeable(data_fmodel, method, args):
+    """Test inplace=False methods leave the buffers of the DataSet writeable"""
+    data_fmodel["NUM"] = rs.DataSeries(np.arange(len(data_fmodel)), dtype="I",
+                                       index=data_fmodel.index)
+    fmodel = data_fmodel["FMODEL"].array.data
+    shallow = data_fmodel.copy(deep=False)
+    result = getattr(data_fmodel, method)(*args)
+    expected_result = result.copy(deep=True)
+
+    assert data_fmodel["FMODEL"].array.data is fmodel
+    data_fmodel["FMODEL"].array.data[1] = 5.
+    shallow["FMODEL"].array.data[2] = 6.
+    data_fmodel["NUM"].array._data[1] = 5
+    assert data_fmodel["FMODEL"].iloc[2] == 6.
+
+    # Writes through buffers referenced before the call leave the result
+    fmodel[0] = 999.
+    assert_frame_equal(result, expected_result)
+
+
+def _write_inplace(ds):
+    """Modify the FMODEL and NUM columns of a DataSet in place"""
+    ds["FMODEL"].iloc[0] = -5.
+    ds["FMODEL"][ds.index[1]] = -6.
+    ds.iat[2, 0] = -7.
+    ds["NUM"].iloc[0] = -1
+    ds.mask(ds["FMODEL"] > 100., 0., inplace=True)
+    np.negative(ds["PHIFMODEL"].array, out=ds["PHIFMODEL"].array)
+
+
+@pytest.mark.parametrize("method,args", [
+    ("label_centrics", ()),
+    ("compute_dHKL", ()),
+    ("apply_symop", ("-y+1/2,x+1/2,z+3/4",)),
+    ("hkl_to_asu", ()),
+    ("hkl_to_key", ()),
+])
+@pytest.mark.parametrize("modify_result", [True, False])
+def test_copy_on_write_independent(data_fmodel, method, args, modify_result):
+    """Test writes to an inplace=False result and its DataSet are independent"""
+    data_fmodel["NUM"] = rs.DataSeries(np.arange(len(data_fmodel)), dtype="I",
+                                       index=data_fmodel.index)
+    result = getattr(data_fmodel, method)(*args)
+    expected = data_fmodel.copy(deep=True)
+    expected_result = result.copy(deep=True)
+
+    if modify_result:
+        _write_inplace(result)
+        assert_frame_equal(data_fmodel, expected)
+        assert (result["FMODEL"].iloc[:3] < 0).all()
+    else:
+        _write_inplace(data_fmodel)
+        assert_frame_equal(result, expected_result)
+        assert (data_fmodel["FMODEL"].iloc[:3] < 0).all()
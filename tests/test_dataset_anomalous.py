@@ -133,3 +133,37 @@ def test_roundtrip_unmerged(data_unmerged):
     assert_frame_equal(result, data_unmerged)
 
 
+@pytest.mark.parametrize("shuffle", [True, False])
+def test_unstack_anomalous_merged(mtz_by_spacegroup, monkeypatch, shuffle):
+    """
+    Test DataSet.unstack_anomalous() with merged data matches an outer merge
+    of the Friedel-plus and Friedel-minus reflections
+    """
+    data = rs.read_mtz(mtz_by_spacegroup)
+    data["SIGF"] = data["FMODEL"].astype("Stddev")
+    if shuffle:
+        data = data.sample(frac=1., random_state=0)
+    result = data.unstack_anomalous(["FMODEL", "PHIFMODEL", "SIGF"])
+
+    with monkeypatch.context() as m:
+        m.setattr(rs.DataSet, "_is_hkl_index", lambda self: False)
+        expected = data.unstack_anomalous(["FMODEL", "PHIFMODEL", "SIGF"])
+    assert_frame_equal(result, expected, check_index_type=False)
+
+
+def test_stack_anomalous_merged(mtz_by_spacegroup):
+    """
+    Test DataSet.stack_anomalous() with merged data matches the Friedel-plus
+    reflections followed by the Friedel-minus reflections
+    """
+    data = rs.read_mtz(mtz_by_spacegroup).unstack_anomalous(["FMODEL", "PHIFMODEL"])
+    result = data.stack_anomalous()
+
+    plus = data[["FMODEL(+)", "PHIFMODEL(+)"]]
+    minus = data[["FMODEL(-)", "PHIFMODEL(-)"]].apply_symop("-x,-y,-z")
+    plus.columns = ["FMODEL", "PHIFMODEL"]
+    minus.columns = ["FMODEL", "PHIFMODEL"]
+    expected = plus.append(minus)
+    expected["FMODEL"] = expected["FMODEL"].from_friedel_dtype()
+    assert_frame_equal(result, expected, check_index_type=False)
+    assert result.merged
@@ -1,4 +1,7 @@
 import pytest
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
 
 @pytest.mark.parametrize("level", [None, ["H", "K", "L"], ["H"]])
 @pytest.mark.parametrize("drop", [True, False])
@@ -44,3 +47,109 @@ def test_reset_index(data_fmodel, level, drop, inplace):
                 assert c not in data_fmodel.columns
         assert cache == list(result._cache_index_dtypes.keys())
         assert cache != list(data_fmodel._cache_index_dtypes.keys())
+
+
+@pytest.mark.parametrize("keys", [["H", "K", "L"], ["L", "H", "K"], ["H", "K", "BATCH"]])
+@pytest.mark.parametrize("inplace", [True, False])
+def test_set_index_hkl(data_unmerged, keys, inplace):
+    """Test DataSet.set_index() and reset_index() with HKL columns match pandas"""
+    data = data_unmerged.reset_index()
+    flat = data.copy()
+    expected = pd.DataFrame.set_index(data, keys)
+
+    result = data.set_index(keys, inplace=inplace)
+    if inplace:
+        assert result is None
+        result = data
+    else:
+        assert_frame_equal(data, flat)
+    assert list(result.index.names) == keys
+    assert all(level.dtype == np.int64 for level in result.index.levels)
+    assert np.array_equal(result.index.to_frame().to_numpy(dtype=np.int32),
+                          expected.index.to_frame().to_numpy(dtype=np.int32))
+    assert_frame_equal(result, expected, check_index_type=False)
+    assert result._cache_index_dtypes == { k: flat[k].dtype.name for k in keys }
+
+    reset = result.reset_index()
+    assert_frame_equal(reset, flat[keys + [c for c in flat.columns if c not in keys]])
+
+
+def test_set_index_hkl_independent(data_unmerged):
+    """Test writes to DataSet.set_index() and reset_index() results do not change the DataSet"""
+    data = data_unmerged.reset_index()
+    flat = data.copy()
+    result = data.set_index(["H", "K", "L"])
+    indexed = result.copy()
+    result["I"].iloc[0] = -1.
+    result.iat[1, 0] = -2
+    np.negative(result["SIGI"].array, out=result["SIGI"].array)
+    assert_frame_equal(data, flat)
+
+    reset = indexed.reset_index()
+    reset["H"].iloc[0] = 100
+    reset["I"].iloc[0] = -1.
+    np.negative(reset["SIGI"].array, out=reset["SIGI"].array)
+    assert_frame_equal(indexed, flat.set_index(["H", "K", "L"]))
+
+
+def test_reset_index_shared_cache(data_fmodel):
+    """Test DataSet.reset_index(inplace=True) does not change copies of a DataSet"""
+    result = data_fmodel.copy()
+    result.reset_index(inplace=True)
+    assert list(data_fmodel._cache_index_dtypes.keys()) == ["H", "K", "L"]
+    result = data_fmodel.compute_dHKL()
+    result.reset_index(level="H", inplace=True)
+    assert_frame_equal(data_fmodel.reset_index(), data_fmodel.copy().reset_index())
+
+@pytest.mark.parametrize("inplace", [True, False])
+@pytest.mark.parametrize("reset", [True, False])
+def test_hkl_to_key(data_fmodel, inplace, reset):
+    """Test DataSet.hkl_to_key() and DataSet.key_to_hkl() roundtrip"""
+    if reset:
+        data_fmodel.reset_index(inplace=True)
+    expected = data_fmodel.copy()
+
+    result = data_fmodel.hkl_to_key(inplace=inplace)
+    if inplace:
+        assert result is data_fmodel
+    else:
+        assert_frame_equal(data_fmodel, expected)
+    if reset:
+        assert "HKLKey" in result.columns
+    else:
+        assert result.index.names == ["HKLKey"]
+    assert not any(k in result.columns for k in ["H", "K", "L"])
+    assert np.array_equal(result.get_hkls(), expected.get_hkls())
+
+    assert_frame_equal(result.key_to_hkl(), expected)
+
+
+def test_hkl_to_key_methods(data_merged):
+    """Test DataSet methods give the same results with an HKLKey index"""
+    keyed = data_merged.hkl_to_key()
+    for method in ["hkl_to_asu", "label_centrics", "compute_dHKL"]:
+        expected = getattr(data_merged, method)()
+        result = getattr(keyed, method)()
+        assert result.index.names == ["HKLKey"]
+        assert_frame_equal(result.key_to_hkl(), expected)
+
+    expected = data_merged.apply_symop("-x,-y,-z")
+    result = keyed.apply_symop("-x,-y,-z")
+    assert_frame_equal(result.key_to_hkl(), expected)
+
+
+def test_hkl_to_key_join(data_merged):
+    """Test DataSet.join() with an HKLKey index"""
+    left = data_merged[["IMEAN"]]
+    right = data_merged[["SIGIMEAN"]].iloc[::2]
+    expected = left.join(right)
+    result = left.hkl_to_key().join(right.hkl_to_key())
+    assert_frame_equal(result.key_to_hkl(), expected, check_index_type=False)
+
+
+def test_hkl_to_key_invalid(data_fmodel):
+    """Test DataSet.hkl_to_key() and key_to_hkl() raise ValueError"""
+    with pytest.raises(ValueError):
+        data_fmodel.reset_index(level="H").hkl_to_key()
+    with pytest.raises(ValueError):
+        data_fmodel.key_to_hkl()
@@ -0,0 +1,122 @@
+import pytest
+import numpy as np
+import gemmi
+from pandas.testing import assert_frame_equal
+import reciprocalspaceship as rs
+
+
+@pytest.fixture
+def datasets(data_merged):
+    """Subsets of merged HEWL data with distinct column labels"""
+    data = data_merged[["IMEAN", "SIGIMEAN", "N(+)"]]
+    objs = []
+    for i in range(5):
+        ds = data.sample(frac=0.8, random_state=i)
+        ds.columns = [ f"{c}_{i}" for c in data.columns ]
+        objs.append(ds)
+    return objs
+
+
+@pytest.mark.parametrize("how", ["outer", "inner", "left"])
+def test_merge_many(datasets, how):
+    """Test rs.merge_many() matches DataSet.join()"""
+    result = rs.merge_many(datasets, how=how)
+    expected = datasets[0].join(datasets[1:], how=how)
+    if how == "outer":
+        expected = expected.sort_index()
+    elif how == "inner":
+        index = datasets[0].index
+        expected = expected.loc[index[index.isin(expected.index)]]
+
+    assert_frame_equal(result, expected, check_index_type=False)
+    assert result.spacegroup.xhm() == datasets[0].spacegroup.xhm()
+    assert result.cell.parameters == datasets[0].cell.parameters
+    assert result._cache_index_dtypes == { "H": "HKL", "K": "HKL", "L": "HKL" }
+
+
+def test_merge_many_suffixes(data_merged):
+    """Test rs.merge_many() with suffixes for overlapping column labels"""
+    objs = [ data_merged[["IMEAN", "SIGIMEAN"]] ]*3
+    with pytest.raises(ValueError):
+        rs.merge_many(objs)
+    with pytest.raises(ValueError):
+        rs.merge_many(objs, suffixes=["_0", "_1"])
+
+    result = rs.merge_many(objs, suffixes=["_0", "_1", "_2"])
+    assert list(result.columns) == ["IMEAN_0", "SIGIMEAN_0", "IMEAN_1",
+                                    "SIGIMEAN_1", "IMEAN_2", "SIGIMEAN_2"]
+    for suffix in ["_0", "_1", "_2"]:
+        assert np.array_equal(result["IMEAN" + suffix].to_numpy(),
+                              data_merged["IMEAN"].to_numpy())
+
+
+def test_merge_many_invalid(datasets):
+    """Test rs.merge_many() raises ValueError with invalid input"""
+    other = datasets[1].copy()
+    other.spacegroup = gemmi.SpaceGroup(19)
+    with pytest.raises(ValueError):
+        rs.merge_many([datasets[0], other])
+    rs.merge_many([datasets[0], other], check_isomorphous=False)
+
+    with pytest.raises(ValueError):
+        rs.merge_many([datasets[0], rs.concat([datasets[1], datasets[1]])])
+    with pytest.raises(ValueError):
+        rs.merge_many([datasets[0], datasets[1].reset_index()])
+    with pytest.raises(ValueError):
+        rs.merge_many(datasets, how="right")
+    with pytest.raises(ValueError):
+        rs.merge_many([])
+
+
+@pytest.mark.parametrize("how", ["inner", "outer", "left", "right"])
+def test_reflection_aligner(datasets, how):
+    """Test rs.ReflectionAligner.join() matches DataSet.join()"""
+    left, right = datasets[0], datasets[1]
+    aligner = rs.ReflectionAligner(left, right, how=how)
+    result = aligner.join(left, right)
+    expected = left.join(right, how=how)
+    if how == "outer":
+        expected = expected.sort_index()
+
+    assert len(aligner) == len(expected)
+    assert_frame_equal(result, expected, check_index_type=False)
+    assert np.array_equal(aligner.get_hkls(), expected.get_hkls())
+    assert result.spacegroup.xhm() == left.spacegroup.xhm()
+    for label in ["IMEAN_0", "N(+)_0"]:
+        assert aligner.take_left(left[label]).equals(expected[label].array)
+    assert np.array_equal(aligner.take_right(right["IMEAN_1"].to_numpy()),
+                          expected["IMEAN_1"].to_numpy(), equal_nan=True)
+
+
+def test_reflection_aligner_repeated(data_merged, data_unmerged):
+    """Test rs.ReflectionAligner with repeated Miller indices"""
+    merged = data_merged[["IMEAN"]]
+    for how in ["left", "inner"]:
+        aligner = rs.ReflectionAligner(data_unmerged, merged, how=how)
+        result = aligner.join(data_unmerged[["I"]], merged)
+        expected = data_unmerged[["I"]].join(merged, how=how)
+
+        # DataSet.join() sorts the result if Miller indices are repeated
+        result = result.sort_index(kind="mergesort")
+        expected = expected.sort_index(kind="mergesort")
+        assert_frame_equal(result, expected, check_index_type=False)
+
+    for how in ["right", "outer"]:
+        with pytest.raises(ValueError):
+            rs.ReflectionAligner(data_unmerged, merged, how=how)
+    with pytest.raises(ValueError):
+        rs.ReflectionAligner(merged, data_unmerged)
+    with pytest.raises(ValueError):
+        rs.ReflectionAligner(merged, merged, how="cross")
+
+
+def test_reflection_aligner_invalid_join(datasets):
+    """Test rs.ReflectionAligner.join() raises ValueError with invalid input"""
+    aligner = rs.ReflectionAligner(datasets[0], datasets[1])
+    with pytest.raises(ValueError):
+        aligner.join(datasets[0], datasets[0])
+    with pytest.raises(ValueError):
+        aligner.join(datasets[0], datasets[1].rename(columns={"IMEAN_1": "IMEAN_0"}))
+    result = aligner.join(datasets[0], datasets[1].rename(columns={"IMEAN_1": "IMEAN_0"}),
+                          rsuffix="_r")
+    assert "IMEAN_0_r" in result.columns
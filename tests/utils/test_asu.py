@@ -89,3 +89,61 @@ def test_hkl_to_observed(sgtbx_by_xhm):
     H_observed = rs.utils.hkl_to_observed(Hasu, isym, sg)
     assert np.array_equal(H, H_observed)
 
+
+@pytest.fixture
+def empty_asu_map_cache():
+    """Clear cached ASUMap objects before and after a test"""
+    rs.utils.asu._asu_map_cache.clear()
+    yield
+    rs.utils.asu._asu_map_cache.clear()
+
+@pytest.mark.parametrize("chunksize", [None, 1, 7, 100])
+def test_hkl_to_asu_chunksize(common_spacegroup, chunksize, empty_asu_map_cache):
+    """Test rs.utils.hkl_to_asu() gives the same result for any chunksize"""
+    np.random.seed(0)
+    H = np.random.randint(-10, 10, (500, 3))
+
+    expected = rs.utils.hkl_to_asu(H, common_spacegroup, return_phase_shifts=True)
+    result = rs.utils.hkl_to_asu(H, common_spacegroup, return_phase_shifts=True,
+                                 chunksize=chunksize)
+    for e, r in zip(expected, result):
+        assert np.array_equal(e, r)
+
+@pytest.mark.parametrize("return_phase_shifts", [True, False])
+def test_asu_map(common_spacegroup, return_phase_shifts, empty_asu_map_cache):
+    """Test rs.utils.ASUMap gives the same result as rs.utils.hkl_to_asu()"""
+    np.random.seed(0)
+    H = np.random.randint(-10, 10, (500, 3))
+    expected = rs.utils.hkl_to_asu(H, common_spacegroup, return_phase_shifts)
+    asu_map = rs.utils.ASUMap(common_spacegroup, [10, 10, 10])
+    assert asu_map.covers(H)
+    assert len(asu_map) == 21**3
+    result = asu_map.lookup(H, return_phase_shifts)
+    for e, r in zip(expected, result):
+        assert np.array_equal(e, r)
+        assert e.dtype == r.dtype
+
+    # Miller indices outside of the table
+    assert not asu_map.covers(H + 11)
+    with pytest.raises(ValueError):
+        asu_map.lookup(H + 11)
+
+def test_get_asu_map(common_spacegroup, empty_asu_map_cache):
+    """Test rs.utils.get_asu_map() caches tables and hkl_to_asu() uses them"""
+    asu_map = rs.utils.get_asu_map(common_spacegroup, [8, 8, 8])
+    assert asu_map is rs.utils.get_asu_map(common_spacegroup, [5, 8, 2])
+    assert asu_map is not rs.utils.get_asu_map(common_spacegroup, [9, 8, 8])
+
+    # Small index boxes are cached automatically
+    np.random.seed(0)
+    H = np.random.randint(-5, 5, (5000, 3))
+    H_asu, isym = rs.utils.hkl_to_asu(H, gemmi.SpaceGroup("P 63 2 2"))
+    assert ("P 6c 2c", (8, 8, 8)) in rs.utils.asu._asu_map_cache
+
+@pytest.mark.parametrize("isym", [0, 9, -1])
+def test_hkl_to_observed_invalid_isym(isym):
+    """Test rs.utils.hkl_to_observed() raises ValueError for invalid isym"""
+    sg = gemmi.SpaceGroup(19)
+    H = np.array([[1, 2, 3], [4, 5, 6]])
+    with pytest.raises(ValueError):
+        rs.utils.hkl_to_observed(H, [1, isym], sg)
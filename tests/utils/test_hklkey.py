@@ -0,0 +1,37 @@
+import pytest
+import numpy as np
+import reciprocalspaceship as rs
+
+
+@pytest.mark.parametrize("hmax", [1, 50, 2**20 - 1])
+def test_hkl_to_key_roundtrip(hmax):
+    """Test rs.utils.key_to_hkl() inverts rs.utils.hkl_to_key()"""
+    H = np.random.randint(-hmax, hmax + 1, size=(1000, 3))
+    H[0] = [-hmax, -hmax, -hmax]
+    H[1] = [hmax, hmax, hmax]
+    key = rs.utils.hkl_to_key(H)
+    assert key.dtype == np.int64
+    result = rs.utils.key_to_hkl(key)
+    assert result.dtype == np.int32
+    assert np.array_equal(result, H)
+
+
+def test_hkl_to_key_order():
+    """Test sorting keys sorts Miller indices lexicographically by H, K, L"""
+    H = np.random.randint(-50, 51, size=(1000, 3))
+    key = rs.utils.hkl_to_key(H)
+    expected = H[np.lexsort(H.T[::-1])]
+    assert np.array_equal(rs.utils.key_to_hkl(np.sort(key)), expected)
+    assert len(np.unique(key)) == len(np.unique(H, axis=0))
+
+
+@pytest.mark.parametrize("H", [
+    [[2**20, 0, 0]],
+    [[0, -2**20 - 1, 0]],
+    [0, 0, 0],
+    np.zeros((5, 4)),
+])
+def test_hkl_to_key_invalid(H):
+    """Test rs.utils.hkl_to_key() raises ValueError with bad input"""
+    with pytest.raises(ValueError):
+        rs.utils.hkl_to_key(H)
@@ -25,6 +25,19 @@ class TestRfree(unittest.TestCase):
 
         return
 
+    def test_add_rfree_unmodified_columns(self):
+
+        datadir = join(abspath(dirname(__file__)), '../data/fmodel')
+        data = rs.read_mtz(join(datadir, '9LYZ.mtz'))
+
+        # Only the R-free-flags column should be assigned
+        rfree = rs.utils.add_rfree(data, fraction=0.5)
+        self.assertTrue(rfree[data.columns].equals(data))
+        self.assertEqual(rfree["R-free-flags"].dtype.name, "MTZInt")
+        self.assertFalse("dHKL" in rfree.columns)
+
+        return
+
     def test_copy_rfree(self):
 
         datadir = join(abspath(dirname(__file__)), '../data/fmodel')
@@ -48,3 +61,26 @@ class TestRfree(unittest.TestCase):
                                        data_rfree["R-free-flags"].values))
 
         return
+
+    def test_copy_rfree_subset(self):
+
+        datadir = join(abspath(dirname(__file__)), '../data/fmodel')
+        data = rs.read_mtz(join(datadir, '9LYZ.mtz'))
+        data_rfree = rs.utils.add_rfree(data, fraction=0.5)
+        subset = data_rfree.sample(frac=0.5, random_state=0)
+
+        # Reflections missing from subset are assigned a flag of 0
+        rfree = rs.utils.copy_rfree(data, subset)
+        expected = subset["R-free-flags"].reindex(data.index).fillna(0)
+        self.assertEqual(rfree["R-free-flags"].dtype.name, "MTZInt")
+        self.assertTrue(np.array_equal(rfree["R-free-flags"].to_numpy(),
+                                       expected.to_numpy()))
+
+        # Flags are copied to unmerged reflections by Miller index
+        unmerged = rs.concat([data, data.iloc[::-1]])
+        rfree = rs.utils.copy_rfree(unmerged, data_rfree)
+        expected = data_rfree["R-free-flags"].reindex(unmerged.index)
+        self.assertTrue(np.array_equal(rfree["R-free-flags"].to_numpy(),
+                                       expected.to_numpy()))
+
+        return
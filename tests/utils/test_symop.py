@@ -0,0 +1,58 @@
+import pytest
+import numpy as np
+import reciprocalspaceship as rs
+import gemmi
+
+
+@pytest.mark.parametrize("sg_type", [gemmi.SpaceGroup, gemmi.GroupOps])
+def test_get_symop_tensors(common_spacegroup, sg_type):
+    """Test rs.utils.get_symop_tensors() against gemmi.Op objects"""
+    if sg_type is gemmi.SpaceGroup:
+        ops = rs.utils.get_symop_tensors(common_spacegroup)
+        assert ops.asu_case is not None
+    else:
+        ops = rs.utils.get_symop_tensors(common_spacegroup.operations())
+        assert ops.asu_case is None
+
+    group_ops = common_spacegroup.operations()
+    assert len(ops) == len(group_ops)
+    assert ops.num_sym_ops == len(group_ops.sym_ops)
+    assert ops.centric == group_ops.is_centric()
+    for i, op in enumerate(group_ops):
+        assert np.array_equal(ops.rot[i], op.rot)
+        assert np.array_equal(ops.tran[i], op.tran)
+        assert np.array_equal(ops.inv_rot[i], op.inverse().rot)
+        assert np.array_equal(ops.inv_tran[i], op.inverse().tran)
+        assert ops.den == op.DEN
+
+
+def test_get_symop_tensors_cache(common_spacegroup):
+    """Test rs.utils.get_symop_tensors() reuses read-only arrays"""
+    ops = rs.utils.get_symop_tensors(common_spacegroup)
+    assert ops is rs.utils.get_symop_tensors(gemmi.SpaceGroup(common_spacegroup.xhm()))
+    with pytest.raises(ValueError):
+        ops.rot[0] = 0
+
+
+def test_get_symop_tensors_invalid():
+    """Test rs.utils.get_symop_tensors() raises ValueError with bad input"""
+    with pytest.raises(ValueError):
+        rs.utils.get_symop_tensors("P 1")
+
+
+def test_apply_to_hkl_batch(common_spacegroup):
+    """Test rs.utils.apply_to_hkl_batch() against rs.utils.apply_to_hkl()"""
+    H = np.random.randint(-20, 20, size=(100, 3)).astype(np.int32)
+    ops = common_spacegroup.operations()
+    result = rs.utils.apply_to_hkl_batch(H, ops)
+
+    assert result.shape == (len(ops), 100, 3)
+    assert result.dtype == H.dtype
+    for i, op in enumerate(ops):
+        assert np.array_equal(result[i], rs.utils.apply_to_hkl(H, op))
+
+
+def test_apply_to_hkl_batch_empty():
+    """Test rs.utils.apply_to_hkl_batch() with no operators"""
+    H = np.zeros((10, 3), dtype=np.int32)
+    assert rs.utils.apply_to_hkl_batch(H, []).shape == (0, 10, 3)